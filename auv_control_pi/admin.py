@@ -2,10 +2,14 @@ from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.models import Group
 from solo.admin import SingletonModelAdmin
-from .models import Configuration, AUVLog
+from .models import Configuration, AUVLog, Geofence, Mission, TelemetryAggregate, ThrustCalibration
 
 admin.site.register(Configuration, SingletonModelAdmin)
 admin.site.register(AUVLog, admin.ModelAdmin)
+admin.site.register(Mission, admin.ModelAdmin)
+admin.site.register(Geofence, admin.ModelAdmin)
+admin.site.register(ThrustCalibration, admin.ModelAdmin)
+admin.site.register(TelemetryAggregate, admin.ModelAdmin)
 
 # remove auth models from admin
 admin.site.unregister(User)
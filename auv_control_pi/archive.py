@@ -0,0 +1,223 @@
+"""
+Append-only telemetry archive
+
+High rate topics (AHRS at 100 Hz, motor outputs) are stored per topic as
+fixed dtype NumPy `.npy` chunks instead of database rows:
+
+    <root>/<topic>/index
+    <root>/<topic>/chunk-000000.npy
+    <root>/<topic>/chunk-000001.npy
+    ...
+
+Every row starts with a float64 `t` (unix time [s]) followed by the topic's
+fields. The index holds one (chunk, t_start, t_end, rows) record per chunk,
+so a reader only opens the chunks overlapping a time range, memory-maps them
+and binary searches `t` for the ends of the slice.
+
+A chunk is written in one go, when it is full, when time goes backwards or
+on `flush`, and only added to the index once it is on disk, so an
+interrupted writer loses at most the rows it had buffered.
+
+`prune` deletes old chunks together with their index records. Chunks keep
+their number, so the index is rewritten under a lock shared with the writers
+but the chunk files are never renamed.
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+INDEX_DTYPE = np.dtype([('chunk', '<u8'), ('t_start', '<f8'), ('t_end', '<f8'), ('rows', '<u8')])
+
+
+def topic_dtype(fields):
+    """Row dtype for a topic with the given (name, dtype) fields
+    """
+    return np.dtype([('t', '<f8')] + list(fields))
+
+
+def chunk_path(path, number):
+    return os.path.join(path, 'chunk-{:06d}.npy'.format(number))
+
+
+def index_path(path):
+    return os.path.join(path, 'index')
+
+
+def read_index(path):
+    if not os.path.exists(index_path(path)):
+        return np.zeros(0, dtype=INDEX_DTYPE)
+    return np.fromfile(index_path(path), dtype=INDEX_DTYPE)
+
+
+@contextmanager
+def locked(path):
+    """Hold the topic's lock, so the index isn't appended to while being rewritten
+    """
+    with open(os.path.join(path, 'lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def topics(root):
+    """Names of the topics archived under `root`
+    """
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.exists(index_path(os.path.join(root, name))))
+
+
+class ArchiveWriter:
+    """Buffer rows for one topic and append them to the archive a chunk at a time
+    """
+
+    def __init__(self, root, topic, fields, chunk_rows=65536):
+        self.topic = topic
+        self.path = os.path.join(root, topic)
+        self.dtype = topic_dtype(fields)
+        self.fields = self.dtype.names[1:]
+        # stored for missing values, NaN where the field can hold it
+        self.missing = tuple(np.nan if self.dtype[name].kind == 'f' else 0 for name in self.fields)
+        self.chunk_rows = chunk_rows
+        os.makedirs(self.path, exist_ok=True)
+        # number of the next chunk, after any already in the archive
+        index = read_index(self.path)
+        self.chunks = int(index['chunk'].max()) + 1 if len(index) else 0
+        self.rows = 0
+        self._buffer = np.zeros(chunk_rows, dtype=self.dtype)
+        self._count = 0
+
+    def append(self, t, **values):
+        """Add a row, fields missing from `values` or None are stored as NaN (or 0 for integers)
+        """
+        if self._count and t < self._buffer['t'][self._count - 1]:
+            # rows within a chunk must be in time order for the readers' binary search
+            self.flush()
+        row = [t]
+        for name, missing in zip(self.fields, self.missing):
+            value = values.get(name)
+            row.append(missing if value is None else value)
+        self._buffer[self._count] = tuple(row)
+        self._count += 1
+        self.rows += 1
+        if self._count == self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as a new chunk
+        """
+        if not self._count:
+            return
+        rows = self._buffer[:self._count]
+        path = chunk_path(self.path, self.chunks)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, rows)
+        os.replace(tmp_path, path)
+
+        record = np.array([(self.chunks, rows['t'][0], rows['t'][-1], self._count)], dtype=INDEX_DTYPE)
+        with locked(self.path), open(index_path(self.path), 'ab') as f:
+            f.write(record.tobytes())
+        self.chunks += 1
+        self._count = 0
+
+    close = flush
+
+
+class ArchiveReader:
+    """Read time ranges of one archived topic as structured arrays
+    """
+
+    def __init__(self, root, topic):
+        self.topic = topic
+        self.path = os.path.join(root, topic)
+        self.index = read_index(self.path)
+        self._chunks = {}
+
+    def __len__(self):
+        return int(self.index['rows'].sum())
+
+    @property
+    def start(self):
+        return float(self.index['t_start'].min()) if len(self.index) else None
+
+    @property
+    def end(self):
+        return float(self.index['t_end'].max()) if len(self.index) else None
+
+    @property
+    def nbytes(self):
+        """Size of the archived chunks on disk
+        """
+        return sum(os.path.getsize(chunk_path(self.path, number)) for number in self.index['chunk'])
+
+    def chunk(self, i):
+        """Memory-mapped rows of the i-th chunk in the index
+        """
+        if i not in self._chunks:
+            self._chunks[i] = np.load(chunk_path(self.path, self.index['chunk'][i]), mmap_mode='r')
+        return self._chunks[i]
+
+    @property
+    def dtype(self):
+        return self.chunk(0).dtype if len(self.index) else None
+
+    def read(self, start=None, end=None, fields=None):
+        """Rows with `start` <= t <= `end`, optionally only the given fields
+
+        A range inside a single chunk is returned as a view of the memory
+        map, anything else is copied into one array.
+        """
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+        overlapping = np.nonzero((self.index['t_end'] >= start) & (self.index['t_start'] <= end))[0]
+
+        parts = []
+        for i in overlapping:
+            rows = self.chunk(i)
+            t = rows['t']
+            lo = np.searchsorted(t, start, side='left')
+            hi = np.searchsorted(t, end, side='right')
+            if hi > lo:
+                parts.append(rows[lo:hi] if fields is None else rows[lo:hi][list(fields)])
+
+        if len(parts) == 1:
+            return parts[0]
+        if parts:
+            return np.concatenate(parts)
+        empty = self.chunk(0)[:0] if len(self.index) else np.zeros(0, dtype=topic_dtype([]))
+        return empty if fields is None else empty[list(fields)]
+
+
+def prune(root, before):
+    """Delete the chunks of every topic with no rows at or after `before` (unix time)
+
+    The newest chunk of a topic is always kept so its numbering carries on.
+    Returns the number of chunks and bytes deleted.
+    """
+    chunks = nbytes = 0
+    for topic in topics(root):
+        path = os.path.join(root, topic)
+        with locked(path):
+            index = read_index(path)
+            expired = index['t_end'] < before
+            expired[-1:] = False
+            if not expired.any():
+                continue
+            tmp_path = index_path(path) + '.tmp'
+            index[~expired].tofile(tmp_path)
+            os.replace(tmp_path, index_path(path))
+        # only once they're out of the index, readers with the old index
+        # keep any chunks they already mapped
+        for number in index['chunk'][expired]:
+            try:
+                nbytes += os.path.getsize(chunk_path(path, number))
+                os.remove(chunk_path(path, number))
+            except FileNotFoundError:
+                continue
+            chunks += 1
+    return chunks, nbytes
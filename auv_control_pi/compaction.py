@@ -0,0 +1,53 @@
+"""
+Roll up telemetry samples into fixed size time buckets
+
+Raw log rows are rolled up into per second buckets, and per second buckets
+into per minute ones. Each bucket keeps the mean, min, max and number of
+samples, so rolling up already aggregated buckets gives the same result as
+rolling up the raw samples directly.
+
+The `compacttelemetry` management command applies this to the database.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+
+def bucket_start(timestamp, resolution):
+    """Start of the `resolution` second bucket holding an aware datetime
+    """
+    seconds = timestamp.timestamp()
+    return datetime.fromtimestamp(seconds - seconds % resolution, tz=timezone.utc)
+
+
+def rollup(samples, resolution):
+    """Aggregate (timestamp, mean, min, max, count) samples into buckets
+
+    Raw values are passed as (timestamp, value, value, value, 1), None values
+    are skipped. Returns an ordered dict of bucket start: (mean, min, max, count).
+    """
+    buckets = OrderedDict()
+    for timestamp, mean, low, high, count in samples:
+        if mean is None:
+            continue
+        start = bucket_start(timestamp, resolution)
+        bucket = buckets.get(start)
+        if bucket is None:
+            buckets[start] = [mean * count, low, high, count]
+        else:
+            bucket[0] += mean * count
+            bucket[1] = min(bucket[1], low)
+            bucket[2] = max(bucket[2], high)
+            bucket[3] += count
+    return OrderedDict(
+        (start, (total / count, low, high, count))
+        for start, (total, low, high, count) in buckets.items()
+    )
+
+
+def windows(start, end, size=timedelta(hours=1)):
+    """Split [start, end) into consecutive windows of at most `size`
+    """
+    while start < end:
+        stop = min(start + size, end)
+        yield start, stop
+        start = stop
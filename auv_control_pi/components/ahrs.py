@@ -22,6 +22,7 @@ the CPU in a threaded environment. It sets magbias to the mean values of x,y,z
 import os
 import asyncio
 import logging
+import time
 from ..wamp import ApplicationSession, rpc, subscribe
 
 PI = os.getenv('PI', False)
@@ -29,7 +30,7 @@ PI = os.getenv('PI', False)
 if PI:
     from navio.lsm9ds1 import LSM9DS1
 
-from ..config import config
+from ..config import config, update_config
 from math import sqrt, atan2, asin, degrees, radians
 from ..utils import micros, elapsed_micros, clamp_angle
 
@@ -60,6 +61,9 @@ class AHRS(ApplicationSession):
         self.beta = sqrt(3.0 / 4.0) * gyro_meas_error  # compute beta (see README)
         self.update_frequency = 10
         self._simulated_heading = 0
+        # turn rate [deg/s] taken from the last auv update
+        self._simulated_turn_rate = 0
+        self._simulated_at = None
 
     def calibrate(self, getxyz, stopfunc, waitfunc=None):
         magmax = list(getxyz())             # Initialise max and min lists with current values
@@ -88,20 +92,30 @@ class AHRS(ApplicationSession):
     @rpc('ahrs.set_declination')
     def set_declination(self, val):
         self.declination = float(val)
-        config.declination = self.declination
-        config.save()
+        update_config(self, declination=self.declination)
 
     @rpc('ahrs.set_board_offset')
     def set_board_offset(self, val):
         self.board_offset = float(val)
-        config.board_offset = self.board_offset
-        config.save()
+        update_config(self, board_offset=self.board_offset)
+
+    def on_config_changed(self, changes):
+        self.declination = config.declination
+        self.board_offset = config.board_offset
+        self.magbias = (config.magbias_x, config.magbias_y, config.magbias_z)
 
     @subscribe('auv.update')
     def _simulate_heading(self, data):
         if SIMULATION:
-            speed = data['turn_speed'] / 10
-            self._simulated_heading += speed
+            # auv updates only arrive on change so integrate the turn rate over time
+            self._step_simulated_heading()
+            self._simulated_turn_rate = data['turn_speed']
+
+    def _step_simulated_heading(self):
+        now = time.monotonic()
+        if self._simulated_at is not None:
+            self._simulated_heading += self._simulated_turn_rate * (now - self._simulated_at)
+        self._simulated_at = now
 
     @property
     def heading(self):
@@ -299,7 +313,9 @@ class AHRS(ApplicationSession):
         This should be called at a frequency between 10-50 Hz
         """
         while True:
-            if not SIMULATION:
+            if SIMULATION:
+                self._step_simulated_heading()
+            else:
                 self._update_data()
 
             self.publish('ahrs.update', {
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+
+from django.conf import settings
+
+from ..archive import ArchiveWriter
+from ..wamp import ApplicationSession, rpc, subscribe
+
+logger = logging.getLogger(__name__)
+
+# fields archived for each topic, a row is appended for every message received
+ARCHIVED_TOPICS = {
+    'ahrs.update': [
+        ('heading', '<f4'),
+        ('roll', '<f4'),
+        ('pitch', '<f4'),
+    ],
+    # auv updates are only published on change (plus keyframes) so the
+    # motor outputs hold their value between rows
+    'auv.update': [
+        ('seq', '<u4'),
+        ('left_motor_speed', '<f4'),
+        ('left_motor_duty_cycle', '<f4'),
+        ('right_motor_speed', '<f4'),
+        ('right_motor_duty_cycle', '<f4'),
+        ('throttle', '<i2'),
+        ('turn_speed', '<i2'),
+    ],
+    'gps.update': [
+        ('lat', '<f8'),
+        ('lng', '<f8'),
+        ('speed', '<f4'),
+        ('course', '<f4'),
+        ('horizontal_accruacy', '<f4'),
+    ],
+}
+
+
+class Archiver(ApplicationSession):
+    """Record high rate topics to the append-only archive
+    """
+    name = 'archive'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.root = settings.ARCHIVE_DIR
+        self.writers = {
+            topic: ArchiveWriter(self.root, topic, fields)
+            for topic, fields in ARCHIVED_TOPICS.items()
+        }
+        # write buffered rows out at least this often so a crash loses little
+        self.flush_interval = 60
+
+    def _append(self, topic, data):
+        self.writers[topic].append(time.time(), **data)
+
+    @subscribe('ahrs.update')
+    def _archive_ahrs(self, data):
+        self._append('ahrs.update', data)
+
+    @subscribe('auv.update')
+    def _archive_auv(self, data):
+        self._append('auv.update', data)
+
+    @subscribe('gps.update')
+    def _archive_gps(self, data):
+        self._append('gps.update', data)
+
+    @rpc('archive.get_stats')
+    def get_stats(self):
+        return {
+            topic: {'rows': writer.rows, 'chunks': writer.chunks}
+            for topic, writer in self.writers.items()
+        }
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    def onLeave(self, details):
+        self.flush()
+        super().onLeave(details)
+
+    async def update(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
@@ -1,12 +1,27 @@
 import asyncio
+import json
 import logging
 
-from ..models import Configuration, AUVLog
-from ..motors import Motor
-from ..wamp import ApplicationSession, rpc
+from django.db.models import Q
+
+from ..config import config, update_config
+from ..geofence import Fence, breach_stops, breached_fences
+from ..models import AUVLog, Geofence, ThrustCalibration
+from ..motors import Motor, PWMScheduler
+from ..telemetry import writer as telemetry
+from ..utils import ChangePublisher, CommandWatchdog, Point
+from ..wamp import ApplicationSession, rpc, subscribe
 
 logger = logging.getLogger(__name__)
-config = Configuration.get_solo()
+
+AUV_LOG_FIELDS = (
+    'left_motor_speed',
+    'left_motor_duty_cycle',
+    'right_motor_speed',
+    'right_motor_duty_cycle',
+    'throttle',
+    'turn_speed',
+)
 
 
 def get_motor_speed(throttle, turn_speed):
@@ -27,33 +42,151 @@ class AUV(ApplicationSession):
         # self.left_motor = Motor(name='left', rc_channel=config.left_motor_channel)
         # self.right_motor = Motor(name='right', rc_channel=config.right_motor_channel)
 
-        self.left_motor = Motor(name='left', rc_channel=10)
-        self.right_motor = Motor(name='right', rc_channel=11)
+        # one task owns the PWM channels and keeps the ESC heartbeat going
+        # speed changes are written straight to the channels
+        self.pwm_scheduler = PWMScheduler(write_through=True)
+        self.left_motor = Motor(name='left', rc_channel=10, scheduler=self.pwm_scheduler)
+        self.right_motor = Motor(name='right', rc_channel=11, scheduler=self.pwm_scheduler)
+        self.motors = {motor.name: motor for motor in (self.left_motor, self.right_motor)}
+        self._set_slew_rates()
+        for calibration in ThrustCalibration.objects.filter(motor__in=self.motors):
+            self.motors[calibration.motor].set_thrust_calibration(calibration.points)
 
         # TODO determine if the trim required is a function of motor speed
 
         # load the current trim value from the database
         self.trim = config.trim
         self.throttle = 0
-        self.throttle_limit = 90
+        # motor outputs are slew limited so full throttle reversals don't brown out the ESC's
+        self.throttle_limit = 100
         self.turn_speed = 0
         self.update_frequency = 10
+        self.state_poll_frequency = 50
+        self.keyframe_interval = 1
+        self.state_publisher = ChangePublisher(
+            keyframe_interval=self.keyframe_interval,
+            max_frequency=self.update_frequency,
+        )
+        # stops the motors if commands stop arriving, e.g. if the nav or rc
+        # process dies or the link to the router drops
+        self.watchdog = CommandWatchdog(config.command_timeout_ms / 1000)
+        # scheduler clock time we started at, to report how long arming took after boot
+        self.started_at = self.pwm_scheduler.clock()
+        self.geofences = []
+        # names of the fences breached at the last fix
+        self.geofence_breaches = []
+        # whether the navigator is steering, from nav.update
+        self.nav_enabled = False
 
     async def onJoin(self, details):
         """Register functions for access via RPC and start update loops
         """
         # arming/disarming the rc controller could arm/disarm the motors
         # as well as doing it from web interface
-        self.left_motor.initialize()
-        self.right_motor.initialize()
+        self.pwm_scheduler.start()
+        # commands are accepted straight away and applied once the motors are armed
+        asyncio.get_event_loop().create_task(self.pwm_scheduler.arm())
+        self.load_geofences()
+        telemetry.start()
         await super().onJoin(details)
+        asyncio.get_event_loop().create_task(self._watch_commands())
+
+    def onLeave(self, details):
+        self.pwm_scheduler.stop()
+        telemetry.stop()
+        super().onLeave(details)
+
+    @subscribe('gps.update')
+    def _update_gps(self, data):
+        if data.get('lat') is None or data.get('lng') is None:
+            return
+        breaches = breached_fences(self.geofences, Point(lat=data['lat'], lng=data['lng']))
+        if breach_stops(breaches, self.geofence_breaches, self.nav_enabled):
+            logger.warning('Geofence breached: {}'.format(', '.join(breaches)))
+            self.call('nav.stop')
+            self.stop()
+            # don't stop again on every fix until the next nav.update
+            self.nav_enabled = False
+        self.geofence_breaches = breaches
+
+    @subscribe('nav.update')
+    def _update_nav(self, data):
+        self.nav_enabled = bool(data.get('enabled'))
+
+    @rpc('auv.load_geofences')
+    def load_geofences(self):
+        """(Re)load the enabled geofences that apply to the active mission
+        """
+        geofences = Geofence.objects.filter(enabled=True).filter(
+            Q(mission__isnull=True) | Q(mission_id=config.active_mission_id)
+        )
+        self.geofences = [Fence.from_model(geofence) for geofence in geofences]
+        return len(self.geofences)
+
+    @rpc('auv.add_geofence')
+    def add_geofence(self, polygon, name='', keep_in=True, mission_id=None):
+        """Add a geofence from a list of [lat, lng] vertices, returns its id
+        """
+        # validate before saving
+        Fence(polygon)
+        geofence = Geofence.objects.create(name=name, polygon=json.dumps(polygon),
+                                           keep_in=keep_in, mission_id=mission_id)
+        self.load_geofences()
+        return geofence.pk
+
+    @rpc('auv.get_geofences')
+    def get_geofences(self):
+        return [{
+            'id': geofence.pk,
+            'name': geofence.name,
+            'polygon': geofence.vertices,
+            'keep_in': geofence.keep_in,
+            'enabled': geofence.enabled,
+            'mission_id': geofence.mission_id,
+        } for geofence in Geofence.objects.all()]
+
+    @rpc('auv.delete_geofence')
+    def delete_geofence(self, geofence_id):
+        Geofence.objects.filter(pk=geofence_id).delete()
+        self.load_geofences()
+
+    @rpc('auv.keepalive')
+    def keepalive(self):
+        """Let the watchdog know the commanding client is still alive
+
+        Clients driving the AUV need to call this (or send commands) more
+        often than the command timeout for the motors to keep running.
+        """
+        self.watchdog.feed()
+
+    @rpc('auv.get_watchdog')
+    def get_watchdog(self):
+        return {
+            'timeout_ms': config.command_timeout_ms,
+            'tripped': self.watchdog.tripped,
+            'trips': self.watchdog.trips,
+            'reaction_ms': self.watchdog.reaction_time * 1e3 if self.watchdog.reaction_time is not None else None,
+        }
+
+    async def _watch_commands(self):
+        await self.watchdog.run(self._commands_stale)
+
+    def _commands_stale(self):
+        logger.warning('No commands for {} ms, stopping'.format(config.command_timeout_ms))
+        self.stop()
+
+    @rpc('auv.get_telemetry')
+    def get_telemetry(self):
+        return telemetry.stats()
 
     @rpc('auv.set_left_motor_speed')
     def set_left_motor_speed(self, speed):
+        self.watchdog.feed()
         self.left_motor.speed = int(speed)
 
     @rpc('auv.set_right_motor_speed')
     def set_right_motor_speed(self, speed):
+        self.watchdog.feed()
         self.right_motor.speed = int(speed)
 
     @rpc('auv.set_trim')
@@ -62,8 +195,51 @@ class AUV(ApplicationSession):
         self._move()
 
         # save trim value to database
-        config.trim = self.trim
-        config.save()
+        update_config(self, trim=self.trim)
+
+    @rpc('auv.set_slew_rate')
+    def set_slew_rate(self, motor, slew_rate):
+        """Set the max rate of change of a motor's output in percent per second, 0 for no limit
+        """
+        if motor not in self.motors:
+            raise ValueError('Unknown motor: {}'.format(motor))
+        update_config(self, **{'{}_motor_slew_rate'.format(motor): float(slew_rate)})
+        self._set_slew_rates()
+
+    def _set_slew_rates(self):
+        self.left_motor.slew_rate = config.left_motor_slew_rate or None
+        self.right_motor.slew_rate = config.right_motor_slew_rate or None
+
+    def on_config_changed(self, changes):
+        if 'trim' in changes:
+            self.trim = config.trim
+            self._move()
+        if 'left_motor_slew_rate' in changes or 'right_motor_slew_rate' in changes:
+            self._set_slew_rates()
+        if 'command_timeout_ms' in changes:
+            self.watchdog.timeout = config.command_timeout_ms / 1000
+        if 'active_mission_id' in changes:
+            self.load_geofences()
+
+    @rpc('auv.set_thrust_calibration')
+    def set_thrust_calibration(self, motor, table=None):
+        """Set a motor's [thrust percent, pulse width us] calibration table, None clears it
+
+        With both motors calibrated to thrust rather than pulse width the
+        boat should track straight without a trim.
+        """
+        if motor not in self.motors:
+            raise ValueError('Unknown motor: {}'.format(motor))
+        self.motors[motor].set_thrust_calibration(table)
+        if table:
+            ThrustCalibration.objects.update_or_create(motor=motor, defaults={'table': json.dumps(table)})
+        else:
+            ThrustCalibration.objects.filter(motor=motor).delete()
+
+    @rpc('auv.get_thrust_calibration')
+    def get_thrust_calibration(self):
+        calibrations = {calibration.motor: calibration.points for calibration in ThrustCalibration.objects.all()}
+        return {name: calibrations.get(name) for name in self.motors}
 
     @rpc('auv.trim_left')
     def trim_left(self):
@@ -76,20 +252,22 @@ class AUV(ApplicationSession):
     def _move(self):
         turn_speed = self.turn_speed + self.trim
 
-        # left turn
-        if turn_speed < 0:
-            self.right_motor.speed = self.throttle
-            self.left_motor.speed = get_motor_speed(self.throttle, turn_speed)
+        # write both motors together once the new speeds are mixed
+        with self.pwm_scheduler.batch():
+            # left turn
+            if turn_speed < 0:
+                self.right_motor.speed = self.throttle
+                self.left_motor.speed = get_motor_speed(self.throttle, turn_speed)
 
-        # right turn
-        elif turn_speed > 0:
-            self.right_motor.speed = get_motor_speed(self.throttle, turn_speed)
-            self.left_motor.speed = self.throttle
+            # right turn
+            elif turn_speed > 0:
+                self.right_motor.speed = get_motor_speed(self.throttle, turn_speed)
+                self.left_motor.speed = self.throttle
 
-        # straight
-        else:
-            self.right_motor.speed = self.throttle
-            self.left_motor.speed = self.throttle
+            # straight
+            else:
+                self.right_motor.speed = self.throttle
+                self.left_motor.speed = self.throttle
 
     @rpc('auv.move_right')
     def move_right(self, turn_speed):
@@ -98,6 +276,7 @@ class AUV(ApplicationSession):
         To move right we adjust the right motor to a percentage of the speed
         of the left motor
         """
+        self.watchdog.feed()
         self.turn_speed = abs(int(turn_speed))
         logger.debug('Move right with speed {}'.format(turn_speed))
         self._move()
@@ -106,6 +285,7 @@ class AUV(ApplicationSession):
     def move_left(self, turn_speed):
         """Adjust the speed of the turning side motor to induce a turn
         """
+        self.watchdog.feed()
         logger.debug('Move left with speed {}'.format(turn_speed))
         self.turn_speed = -abs(int(turn_speed))
         self._move()
@@ -114,11 +294,13 @@ class AUV(ApplicationSession):
     def move_center(self):
         """Remove any turn from the motors
         """
+        self.watchdog.feed()
         self.turn_speed = 0
         self._move()
 
     @rpc('auv.set_turn_val')
     def set_turn_val(self, turn_speed):
+        self.watchdog.feed()
         self.turn_speed = int(turn_speed)
         self._move()
 
@@ -126,24 +308,29 @@ class AUV(ApplicationSession):
     def rotate_right(self, speed):
         """Set motors in opposite direction to rotate craft
         """
+        self.watchdog.feed()
         logger.debug('Rotate right with speed {}'.format(speed))
         speed = int(speed)
         self.throttle = 0
-        self.left_motor.forward(speed)
-        self.right_motor.reverse(speed)
+        with self.pwm_scheduler.batch():
+            self.left_motor.forward(speed)
+            self.right_motor.reverse(speed)
 
     @rpc('auv.rotate_left')
     def rotate_left(self, speed):
         """Set motors in opposite direction to rotate craft
         """
+        self.watchdog.feed()
         logger.debug('Rotate left with speed {}'.format(speed))
         speed = int(speed)
         self.throttle = 0
-        self.left_motor.reverse(speed)
-        self.right_motor.forward(speed)
+        with self.pwm_scheduler.batch():
+            self.left_motor.reverse(speed)
+            self.right_motor.forward(speed)
 
     @rpc('auv.set_throttle')
     def set_throttle(self, throttle):
+        self.watchdog.feed()
         throttle = int(throttle)
         throttle = max(-self.throttle_limit, throttle)
         throttle = min(self.throttle_limit, throttle)
@@ -152,6 +339,7 @@ class AUV(ApplicationSession):
 
     @rpc('auv.forward_throttle')
     def forward_throttle(self, throttle=0):
+        self.watchdog.feed()
         logger.debug('Setting forward throttle to {}'.format(throttle))
         throttle = abs(int(throttle))
         throttle = min(self.throttle_limit, throttle)
@@ -160,6 +348,7 @@ class AUV(ApplicationSession):
 
     @rpc('auv.reverse_throttle')
     def reverse_throttle(self, throttle=0):
+        self.watchdog.feed()
         logger.debug('Move reverse with speed {}'.format(throttle))
         throttle = -(abs(int(throttle)))
         throttle = max(-self.throttle_limit, throttle)
@@ -171,25 +360,43 @@ class AUV(ApplicationSession):
         logger.info('Stopping')
         self.throttle = 0
         self.turn_speed = 0
-        self.left_motor.stop()
-        self.right_motor.stop()
+        with self.pwm_scheduler.batch():
+            self.left_motor.stop()
+            self.right_motor.stop()
+
+    def _armed_at(self):
+        """Seconds after startup the motors were armed, None while arming
+        """
+        if not self.pwm_scheduler.armed:
+            return None
+        return round(self.pwm_scheduler.armed_at - self.started_at, 3)
+
+    def _state(self):
+        return {
+            'left_motor_speed': self.left_motor.speed,
+            'left_motor_duty_cycle': self.left_motor.duty_cycle_ms,
+            'right_motor_speed': self.right_motor.speed,
+            'right_motor_duty_cycle': self.right_motor.duty_cycle_ms,
+            'throttle': self.throttle,
+            'turn_speed': self.turn_speed,
+            'trim': self.trim,
+            'geofence_breaches': self.geofence_breaches,
+            'watchdog_tripped': self.watchdog.tripped,
+            'armed': self.pwm_scheduler.armed,
+            'armed_at': self._armed_at(),
+            # 'timestamp': timezone.now().isoformat()
+        }
 
     async def update(self):
         """Publish current state to anyone listening
+
+        The state is checked at `state_poll_frequency` and published as soon
+        as it changes, at most `update_frequency` times per second, with a
+        keyframe every `keyframe_interval` seconds while nothing changes.
         """
         while True:
-            payload = {
-                'left_motor_speed': self.left_motor.speed,
-                'left_motor_duty_cycle': self.left_motor.duty_cycle_ms,
-                'right_motor_speed': self.right_motor.speed,
-                'right_motor_duty_cycle': self.right_motor.duty_cycle_ms,
-                'throttle': self.throttle,
-                'turn_speed': self.turn_speed,
-                'trim': self.trim,
-                # 'timestamp': timezone.now().isoformat()
-            }
-            self.publish('auv.update', payload)
-
-            # log to database
-            # AUVLog.objects.create(**payload)
-            await asyncio.sleep(1 / self.update_frequency)
+            payload = self.state_publisher.poll(self._state())
+            if payload is not None:
+                self.publish('auv.update', payload)
+                telemetry.log(AUVLog, **{field: payload[field] for field in AUV_LOG_FIELDS})
+            await asyncio.sleep(1 / self.state_poll_frequency)
@@ -6,11 +6,9 @@ import requests
 from goprocam import GoProCamera
 from datauri import DataURI
 
-from ..models import Configuration
 from ..wamp import ApplicationSession, rpc
 
 logger = logging.getLogger(__name__)
-config = Configuration.get_solo()
 
 
 def download_image(url):
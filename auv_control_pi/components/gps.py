@@ -1,16 +1,39 @@
 import os
+import time
 import asyncio
 import logging
 
 from auv_control_pi.utils import point_at_distance, Point
-from navio.gps import GPS
+from navio.gps import GPS, GPSReader, ReplayGPS, satellite_summary
+from navio.ublox import UBloxError
 from ..models import GPSLog
+from ..telemetry import writer as telemetry
 from ..wamp import ApplicationSession, rpc, subscribe
 
 logger = logging.getLogger(__name__)
 PI = os.getenv('PI', False)
 SIMULATION = os.getenv('SIMULATION', False)
 
+# record the raw receiver output to an indexed log
+GPS_LOGFILE = os.getenv('GPS_LOGFILE', None)
+# replay a recorded log instead of reading the receiver
+GPS_REPLAY = os.getenv('GPS_REPLAY', None)
+GPS_REPLAY_SPEED = float(os.getenv('GPS_REPLAY_SPEED', 1))
+
+# NAV_PVT fixType values
+FIX_TYPES = {
+    0: 'no_fix',
+    1: 'dead_reckoning',
+    2: '2d',
+    3: '3d',
+    4: 'gnss_dead_reckoning',
+    5: 'time_only',
+}
+
+# if no message arrives from the receiver within this many seconds
+# the gps is reported as having no data
+GPS_TIMEOUT = 3
+
 
 class GPSComponent(ApplicationSession):
     name = 'gps'
@@ -19,10 +42,14 @@ class GPSComponent(ApplicationSession):
         super().__init__(*args, **kwargs)
 
         # initialize the gps
-        if PI and not SIMULATION:
+        if GPS_REPLAY:
             self.lat = None
             self.lng = None
-            self.gps = GPS()
+            self.gps = ReplayGPS(GPS_REPLAY, speed=GPS_REPLAY_SPEED)
+        elif PI and not SIMULATION:
+            self.lat = None
+            self.lng = None
+            self.gps = GPS(logfile=GPS_LOGFILE)
         elif SIMULATION:
             self.gps = None
             # Jericho Beach
@@ -34,8 +61,19 @@ class GPSComponent(ApplicationSession):
         self.height_sea = None
         self.horizontal_accruacy = None
         self.vertiacl_accruracy = None
+        self.speed = None  # ground speed [m/s]
+        self.course = None  # heading of motion [deg]
+        self.fix_type = None
+        self.num_sv = None
+        self.itow = None  # GPS time of week of the navigation epoch [ms]
+        self.satellites = None
         self.throttle = 0
         self.heading = 0
+        self.last_msg_time = None
+
+        # messages are read in a background thread and handed over through this queue
+        self._messages = asyncio.Queue(maxsize=50)
+        self._reader = None
 
     @subscribe('auv.update')
     def _update_auv(self, data):
@@ -53,29 +91,102 @@ class GPSComponent(ApplicationSession):
     def get_status(self):
         return self.status
 
+    def onLeave(self, details):
+        if self._reader is not None:
+            self._reader.stop()
+            self._reader = None
+        if self.gps is not None:
+            self.gps.ubl.close()
+        telemetry.stop()
+        super().onLeave(details)
+
+    def _read_messages(self):
+        """Parse all the messages the reader thread has queued up without blocking
+        """
+        while not self._messages.empty():
+            msg = self._messages.get_nowait()
+            self.last_msg_time = time.monotonic()
+            try:
+                self._parse_msg(msg)
+            except UBloxError as e:
+                logger.debug('Skipping GPS message: {}'.format(e))
+
+        last_msg_age = time.monotonic() - self.last_msg_time
+        if last_msg_age > GPS_TIMEOUT and self.status != 'no_data':
+            logger.warning('No data from GPS receiver for {} seconds'.format(GPS_TIMEOUT))
+            self.status = 'no_data'
+
     def _parse_msg(self, msg):
         """
         Update all local instance variables
         """
-        if msg.name() == "NAV_POSLLH":
-            self.lat = msg.Latitude / 10e6
-            self.lng = msg.Longitude / 10e6
-            self.height_ellipsoid = msg.height
-            self.height_sea = msg.hMSL
-            self.horizontal_accruacy = msg.hAcc
-            self.vertiacl_accruracy = msg.vAcc
+        if msg.name() == "NAV_PVT":
+            msg.unpack()
+            self.itow = msg.iTOW
+            self.fix_type = msg.fixType
+            self.num_sv = msg.numSV
+            self.status = FIX_TYPES.get(msg.fixType)
+
+            # only trust the solution when the receiver flags it as valid (gnssFixOK)
+            if msg.flags & 0x01:
+                self.lat = msg.lat * 1e-7
+                self.lng = msg.lon * 1e-7
+                self.height_ellipsoid = msg.height / 1e3
+                self.height_sea = msg.hMSL / 1e3
+                self.horizontal_accruacy = msg.hAcc / 1e3
+                self.vertiacl_accruracy = msg.vAcc / 1e3
+                self.speed = msg.gSpeed / 1e3
+                self.course = msg.headMot * 1e-5
+                self._log_fix()
+
+        elif msg.name() == "NAV_SVINFO":
+            msg.unpack(columnar=True)
+            self.satellites = satellite_summary(msg)
+
+        elif msg.name() == "NAV_POSLLH":
+            msg.unpack()
+            self.itow = msg.iTOW
+            self.lat = msg.Latitude * 1e-7
+            self.lng = msg.Longitude * 1e-7
+            self.height_ellipsoid = msg.height / 1e3
+            self.height_sea = msg.hMSL / 1e3
+            self.horizontal_accruacy = msg.hAcc / 1e3
+            self.vertiacl_accruracy = msg.vAcc / 1e3
+            self._log_fix()
+
+    def _log_fix(self):
+        """Log the position once per navigation solution from the receiver
+        """
+        if PI:
+            telemetry.log(
+                GPSLog,
+                lat=round(self.lat, 6),
+                lon=round(self.lng, 6),
+                height_sea=self.height_sea,
+                height_ellipsoid=self.height_ellipsoid,
+                horizontal_accruacy=self.horizontal_accruacy,
+                vertiacl_accruracy=self.vertiacl_accruracy,
+            )
 
     async def update(self):
+        telemetry.start()
+        if self.gps is not None:
+            self._reader = GPSReader(self.gps, asyncio.get_event_loop(), self._messages)
+            self._reader.start()
+            self.last_msg_time = time.monotonic()
+
         while True:
-            if PI:
-                msg = self.gps.update()
-                self._parse_msg(msg)
+            if self.gps is not None:
+                self._read_messages()
             elif SIMULATION:
                 if self.throttle > 0:
                     distance = self.throttle / 10
                     new_point = point_at_distance(distance, self.heading, Point(self.lat, self.lng))
                     self.lat = new_point.lat
                     self.lng = new_point.lng
+                # we move throttle / 10 meters every 0.1s
+                self.speed = max(self.throttle, 0)
+                self.course = self.heading
 
             payload = {
                 'lat': self.lat,
@@ -84,12 +195,14 @@ class GPSComponent(ApplicationSession):
                 'height_ellipsoid': self.height_ellipsoid,
                 'horizontal_accruacy': self.horizontal_accruacy,
                 'vertiacl_accruracy': self.vertiacl_accruracy,
+                'speed': self.speed,
+                'course': self.course,
+                'fix_type': self.fix_type,
+                'num_sv': self.num_sv,
+                'itow': self.itow,
+                'satellites': self.satellites,
             }
 
             self.publish('gps.update', payload)
 
-            if PI and self.lat is not None:
-                payload['lon'] = payload.pop('lng')
-                # GPSLog.objects.create(**payload)
-
             await asyncio.sleep(0.1)
@@ -1,17 +1,24 @@
 import os
 import asyncio
 import logging
+import time
 from collections import deque
 
 from simple_pid import PID
 
-from auv_control_pi.config import config
-from auv_control_pi.utils import Point, distance_to_point, heading_to_point, get_error_angle
+from auv_control_pi import coverage, missions
+from auv_control_pi.config import config, update_config
+from auv_control_pi.geodesy import LocalFrame, Leg, bearing_distance
+from auv_control_pi.models import GUIDANCE_LOS, GUIDANCE_MODES, Mission
+from auv_control_pi.utils import Point, GeodesicCache, LatencyStats, RateLimiter, get_error_angle
 from auv_control_pi.wamp import ApplicationSession, rpc, subscribe
 
 SIMULATION = os.getenv('SIMULATION', False)
 logger = logging.getLogger(__name__)
 
+# heading and position older than this [s] are too stale to steer on
+MAX_SENSOR_AGE = 1
+
 
 class Navitgator(ApplicationSession):
 
@@ -21,35 +28,70 @@ class Navitgator(ApplicationSession):
         self.heading = None
         self.target_heading = None
         self.current_location = None
+        # when the last heading and position arrived (time.monotonic)
+        self.heading_at = None
+        self.location_at = None
         self.target_waypoint = None
+        # steering rate when steering on a timer (config.max_steer_frequency == 0),
+        # otherwise each heading update triggers a steering step
         self.update_frequency = 10
+        self.status_frequency = 2
+        self.steer_limiter = RateLimiter(config.max_steer_frequency)
         self.arrived = False
         self.waypoints = deque()
         self.completed_waypoints = []
+        # bumped on every change to the waypoint lists, which are published
+        # as deltas on `nav.waypoints` rather than with every `nav.update`
+        self.waypoints_version = 0
         # the pid setpoint is the error setpoint
         # and thus we always want the error to be 0 regardless of the scale
         # we use to feed into the pid.
         self.pid = PID(config.kP, config.kI, config.kD, setpoint=0, output_limits=(-100, 100))
         self.pid_output = None
         self.heading_error = None
+        # local tangent plane centered on the trip origin, waypoints are
+        # projected into it once so each tick only needs cheap planar math
+        self.frame = None
+        self._target_enu = None
+        # legs of the current trip, planned once when it starts
+        self.legs = deque()
+        self.leg = None
+        # the persisted mission being run, with all of its legs indexed
+        # for finding the closest one when rejoining the track
+        self.mission = None
+        self.plan = None
+        self.cross_track_error = None
+        self._target_geodesic = GeodesicCache(self._project_bearing_distance, maxsize=16)
+        # time from a steering decision until the motors have been updated
+        self.steer_latency = LatencyStats()
 
     @subscribe('ahrs.update')
     def _update_ahrs(self, data):
         self.heading = data.get('heading', None)
+        self.heading_at = time.monotonic()
+        if config.max_steer_frequency and self.steer_limiter.ready():
+            self._control_step()
 
     @subscribe('gps.update')
     def _update_gps(self, data):
         self.current_location = Point(lat=data.get('lat'), lng=data.get('lng'))
+        self.location_at = time.monotonic()
+
+    def on_config_changed(self, changes):
+        self.pid.Kp = config.kP
+        self.pid.Ki = config.kI
+        self.pid.Kd = config.kD
+        self.steer_limiter.max_frequency = config.max_steer_frequency
 
     @rpc('nav.set_pid_values')
     def set_pid_values(self, kP, kI, kD, debounce=None):
         self.pid.Kp = float(kP)
         self.pid.Ki = float(kI)
         self.pid.Kd = float(kD)
-        config.kP, config.kI, config.kD = self.pid.Kp, self.pid.Ki, self.pid.Kd
+        changes = {'kP': self.pid.Kp, 'kI': self.pid.Ki, 'kD': self.pid.Kd}
         if debounce is not None:
-            config.pid_error_debounce = debounce
-        config.save()
+            changes['pid_error_debounce'] = float(debounce)
+        update_config(self, **changes)
 
     @rpc('nav.get_pid_values')
     def get_pid_values(self):
@@ -68,32 +110,125 @@ class Navitgator(ApplicationSession):
 
     @rpc('nav.set_target_waypoint_distance')
     def set_target_waypoint_distance(self, target_waypoint_distance):
-        config.target_waypoint_distance = int(target_waypoint_distance)
-        config.save()
+        update_config(self, target_waypoint_distance=int(target_waypoint_distance))
+
+    @rpc('nav.get_guidance')
+    def get_guidance(self):
+        return {
+            'mode': config.guidance_mode,
+            'lookahead': config.los_lookahead,
+        }
+
+    @rpc('nav.set_guidance')
+    def set_guidance(self, mode, lookahead=None):
+        if mode not in dict(GUIDANCE_MODES):
+            raise ValueError('Unknown guidance mode: {}'.format(mode))
+        changes = {'guidance_mode': mode}
+        if lookahead is not None:
+            changes['los_lookahead'] = float(lookahead)
+        update_config(self, **changes)
 
     @rpc('nav.move_to_waypoint')
     def move_to_waypoint(self, waypoint):
-        self.call('auv.forward_throttle', 50)
-        self.pid.auto_mode = True
         if isinstance(waypoint, dict):
             waypoint = Point(**waypoint)
-        logger.info('Moving to waypint: {}'.format(waypoint))
-        self.arrived = False
-        self.target_waypoint = waypoint
-        self.target_heading = heading_to_point(self.current_location, waypoint)
-        self.enabled = True
+        location = self._known_location() or waypoint
+        if self.frame is None:
+            self.frame = LocalFrame(location)
+        start = self.frame.to_enu(location)
+        self._move_along(waypoint, Leg(start, self.frame.to_enu(waypoint)))
+        # the target changed outside of an `advance`, subscribers need a new snapshot
+        self._publish_waypoints('reset', **self.get_waypoints())
+
+    @rpc('nav.create_mission')
+    def create_mission(self, name=''):
+        """Create an empty mission to upload waypoints to, returns its id
+        """
+        return Mission.objects.create(name=name).pk
+
+    @rpc('nav.upload_waypoints')
+    def upload_waypoints(self, mission_id, offset, waypoints):
+        """Add a chunk of waypoints to a mission, see `missions.upload_waypoints`
+        """
+        return missions.upload_waypoints(mission_id, offset, waypoints)
+
+    @rpc('nav.start_mission')
+    def start_mission(self, mission_id, waypoint_index=0):
+        self._load_mission(Mission.objects.get(pk=mission_id))
+        waypoint = self.plan.points[waypoint_index]
+        start = self.frame.to_enu(self._known_location() or waypoint)
+        self._start_at(waypoint_index, Leg(start, self.frame.to_enu(waypoint)))
+        # only resumed after a restart once it has actually started
+        update_config(self, active_mission_id=self.mission.pk)
+
+    @rpc('nav.generate_mission')
+    def generate_mission(self, polygon, spacing, pattern=coverage.LAWNMOWER, angle=None, name=None):
+        """Generate a coverage pattern over a polygon of [lat, lng] vertices
+
+        The waypoints are returned ready for `nav.start_trip`. If a `name`
+        is given they are also saved as a new mission for `nav.start_mission`.
+        """
+        kwargs = {'angle': angle} if pattern == coverage.LAWNMOWER else {}
+        waypoints = [point._asdict() for point in coverage.generate(polygon, float(spacing), pattern, **kwargs)]
+        mission_id = None
+        if name is not None:
+            mission_id = self.create_mission(name)
+            self.upload_waypoints(mission_id, 0, waypoints)
+        return {
+            'mission_id': mission_id,
+            'waypoints': waypoints,
+        }
 
     @rpc('nav.start_trip')
     def start_trip(self, waypoints=None):
         if waypoints:
-            self.waypoints = deque(waypoints)
-            self.completed_waypoints = []
-            self.move_to_waypoint(self.waypoints.popleft())
+            mission_id = self.create_mission()
+            self.upload_waypoints(mission_id, 0, waypoints)
+            self.start_mission(mission_id)
+
+    @rpc('nav.rejoin_mission')
+    def rejoin_mission(self):
+        """Continue the mission along the leg closest to the current location
+
+        Legs before the one leading to the last saved waypoint are skipped so
+        we don't repeat finished parts of the mission that pass nearby.
+        """
+        if self.plan is None or self._known_location() is None:
+            return False
+        rejoin = self.plan.rejoin(self.current_location)
+        if rejoin is None:
+            return False
+        self._start_at(*rejoin)
+        return True
 
     @rpc('nav.resume_trip')
     def resume_trip(self):
-        if not self.arrived:
-            self.move_to_waypoint(self.target_waypoint)
+        if self.target_waypoint and not self.arrived:
+            # rejoin the leg we were on rather than heading straight for the waypoint
+            self._move_along(self.target_waypoint, self.leg)
+        elif self.target_waypoint is None:
+            # nothing in progress since a restart, pick the saved mission back up
+            self.rejoin_mission()
+
+    @rpc('nav.get_waypoints')
+    def get_waypoints(self):
+        """Snapshot of the waypoint lists, deltas published on `nav.waypoints` apply on top of it
+        """
+        return {
+            'version': self.waypoints_version,
+            'mission_id': self.mission.pk if self.mission else None,
+            'target_waypoint': self.target_waypoint._asdict() if self.target_waypoint else None,
+            'waypoints': list(self.waypoints),
+            'completed_waypoints': list(self.completed_waypoints),
+        }
+
+    @rpc('nav.get_stats')
+    def get_stats(self):
+        return {
+            'geodesic_cache': self._target_geodesic.stats(),
+            'steer_steps_skipped': self.steer_limiter.skipped,
+            'steer_latency': self.steer_latency.stats(),
+        }
 
     @rpc('nav.stop')
     def stop(self):
@@ -102,35 +237,32 @@ class Navitgator(ApplicationSession):
         self.call('auv.stop')
 
     async def update(self):
-        """Update the current position and heading
+        """Steer on a fixed timer when not steering on heading updates
         """
+        if config.active_mission_id is not None:
+            try:
+                self._load_mission(Mission.objects.get(pk=config.active_mission_id))
+                logger.info('Loaded {}, resume it with nav.resume_trip'.format(self.mission))
+            except (Mission.DoesNotExist, ValueError) as e:
+                # a deleted or empty mission can't be resumed, don't try again on every restart
+                logger.warning('Not resuming mission {}: {}'.format(config.active_mission_id, e))
+                update_config(self, active_mission_id=None)
+
+        loop = asyncio.get_event_loop()
+        loop.create_task(self._publish_status())
+        while True:
+            if not config.max_steer_frequency:
+                self._control_step()
+            await asyncio.sleep(1 / self.update_frequency)
+
+    async def _publish_status(self):
         while True:
-            if self.enabled and self.target_waypoint and not self.arrived:
-                # check if we have hit our target within the target distance
-                # Note: target distance is the minimum distance we need to
-                # arrive at in order to consider ourselves "arrived"
-                # at the waypoint
-                if self.distance_to_target <= config.target_waypoint_distance:
-                    try:
-                        self.completed_waypoints.append(self.target_waypoint._asdict())
-                        # if there are waypoints qeued up keep going
-                        self.move_to_waypoint(self.waypoints.popleft())
-                    except IndexError:
-                        # otherwise we have arrived
-                        self.arrived = True
-                        self.stop()
-                        logger.info('Arrived at {}'.format(self.target_waypoint))
-
-                # otherwise keep steering towards the target waypoint
-                else:
-                    self._steer()
-
-            config.refresh_from_db()
             self.publish('nav.update', {
                 'enabled': self.enabled,
                 'target_waypoint': self.target_waypoint._asdict() if self.target_waypoint else None,
-                'completed_waypoints': list(self.completed_waypoints),
-                'waypoints': list(self.waypoints),
+                'waypoints_version': self.waypoints_version,
+                'waypoints_remaining': len(self.waypoints),
+                'waypoints_completed': len(self.completed_waypoints),
                 'target_heading': self.target_heading,
                 'kP': self.pid.Kp,
                 'kI': self.pid.Ki,
@@ -138,16 +270,130 @@ class Navitgator(ApplicationSession):
                 'heading_error': self.heading_error,
                 'pid_output': self.pid_output,
                 'arrived': self.arrived,
-                'distance_to_target': self.distance_to_target
+                'distance_to_target': self.distance_to_target,
+                'cross_track_error': self.cross_track_error,
+                'guidance_mode': config.guidance_mode,
             })
-            await asyncio.sleep(1 / self.update_frequency)
+            await asyncio.sleep(1 / self.status_frequency)
+
+    def _control_step(self):
+        """Check for arrival at the target waypoint, otherwise steer towards it
+        """
+        if not (self.enabled and self.target_waypoint and not self.arrived):
+            return
+        if not self._sensors_fresh():
+            # without a keepalive the auv's command watchdog stops the motors
+            return
+
+        if config.guidance_mode == GUIDANCE_LOS and self.leg.length:
+            along, self.cross_track_error = self.leg.track_errors(self.frame.to_enu(self.current_location))
+            target_heading = self.leg.los_heading(self.cross_track_error, config.los_lookahead)
+            reached = self.leg.reached_end(along, self.cross_track_error, config.target_waypoint_distance)
+        else:
+            target_heading, distance_to_target = self._bearing_distance_to_target()
+            # check if we have hit our target within the target distance
+            # Note: target distance is the minimum distance we need to
+            # arrive at in order to consider ourselves "arrived"
+            # at the waypoint
+            reached = distance_to_target <= config.target_waypoint_distance
+        if reached:
+            completed = self.target_waypoint._asdict()
+            self.completed_waypoints.append(completed)
+            try:
+                # if there are waypoints qeued up keep going
+                self._move_along(Point(**self.waypoints.popleft()), self.legs.popleft())
+            except IndexError:
+                # otherwise we have arrived
+                self.arrived = True
+                self.stop()
+                logger.info('Arrived at {}'.format(self.target_waypoint))
+                if self.mission is not None:
+                    update_config(self, active_mission_id=None)
+            self._save_progress()
+            self._publish_waypoints(
+                'advance',
+                completed=completed,
+                target_waypoint=None if self.arrived else self.target_waypoint._asdict(),
+            )
+
+        # otherwise keep steering towards the target waypoint
+        else:
+            self._steer(target_heading)
+
+        # steering commands only go out when the heading is off, keep the
+        # auv's command watchdog fed while we're steering on live data
+        if self.enabled:
+            self.call('auv.keepalive')
+
+    def _sensors_fresh(self):
+        if self.heading is None or self._known_location() is None:
+            return False
+        now = time.monotonic()
+        return now - self.heading_at <= MAX_SENSOR_AGE and now - self.location_at <= MAX_SENSOR_AGE
+
+    def _known_location(self):
+        """The current location, or None before the first GPS fix
+
+        Until then the GPS publishes a location with lat and lng set to None.
+        """
+        if self.current_location is None or self.current_location.lat is None:
+            return None
+        return self.current_location
+
+    def _load_mission(self, mission):
+        self.plan = missions.MissionPlan(mission)
+        self.mission = mission
+        self.frame = self.plan.frame
+        self._target_geodesic.clear()
+
+    def _start_at(self, waypoint_index, leg):
+        """Steer along `leg` to the mission waypoint at `waypoint_index`, then carry on with the rest
+        """
+        points = self.plan.points
+        self.completed_waypoints = [point._asdict() for point in points[:waypoint_index]]
+        self.waypoints = deque(point._asdict() for point in points[waypoint_index + 1:])
+        self.legs = deque(self.plan.legs[waypoint_index:])
+        self._move_along(points[waypoint_index], leg)
+        self._save_progress()
+        self._publish_waypoints('reset', **self.get_waypoints())
+
+    def _save_progress(self):
+        if self.mission is not None:
+            missions.save_progress(self.mission, len(self.completed_waypoints))
 
-    def _steer(self):
+    def _move_along(self, waypoint, leg):
+        """Start steering along `leg` towards `waypoint`
+        """
+        self.call('auv.forward_throttle', 50)
+        self.pid.auto_mode = True
+        logger.info('Moving to waypint: {}'.format(waypoint))
+        self.arrived = False
+        self.target_waypoint = waypoint
+        self.leg = leg
+        self._target_enu = leg.end
+        self.cross_track_error = None
+        self.target_heading = leg.bearing
+        self.enabled = True
+
+    def _publish_waypoints(self, event, **data):
+        """Publish a change to the waypoint lists on `nav.waypoints`
+
+        `reset` carries a full snapshot. `advance` means the target waypoint
+        was appended to the completed list and the next queued waypoint (if any)
+        became the target. A subscriber that sees a gap in `version` should
+        fetch a fresh snapshot with `nav.get_waypoints`.
+        """
+        self.waypoints_version += 1
+        data['version'] = self.waypoints_version
+        data['event'] = event
+        self.publish('nav.waypoints', data)
+
+    def _steer(self, target_heading):
         """Calculate heading error to feed into PID
         """
         # TODO think about how often should we update the target heading?
         # if it's updated too often then it could cause jittery behavior
-        self.target_heading = heading_to_point(self.current_location, self.target_waypoint)
+        self.target_heading = target_heading
         self.heading_error = get_error_angle(self.target_heading, self.heading)
         # update the pid
         self.pid_output = self.pid(self.heading_error)
@@ -156,18 +402,26 @@ class Navitgator(ApplicationSession):
         if abs(self.heading_error) > config.pid_error_debounce:
             # take action to ajdust the speed of each motor to steer
             # in the direction to minimize the heading error
-            self.call('auv.set_turn_val', self.pid_output)
+            start = time.perf_counter()
+            result = self.call('auv.set_turn_val', self.pid_output)
+            result.add_done_callback(lambda _: self.steer_latency.add(time.perf_counter() - start))
+
+    def _project_bearing_distance(self, location, target_waypoint):
+        return bearing_distance(self.frame.to_enu(location), self._target_enu)
+
+    def _bearing_distance_to_target(self):
+        """Bearing and distance from the current location to the target waypoint
+
+        Results are memoized on (location, waypoint) since the location only
+        changes when a new GPS fix arrives.
+        """
+        return self._target_geodesic(self.current_location, self.target_waypoint)
 
     @property
     def distance_to_target(self):
-        if self.target_waypoint:
-            return distance_to_point(self.current_location, self.target_waypoint)
+        # published from the status task, which a projection error would end
+        if self.target_waypoint and self._known_location() is not None:
+            return self._bearing_distance_to_target()[1]
         else:
             return None
 
-
-class Trip:
-
-    def __init__(self, pk, waypoints):
-        self.pk = pk
-        self.waypoints = [Point(lat=w['lat'], lng=w['lng']) for w in waypoints]
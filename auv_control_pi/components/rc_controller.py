@@ -41,6 +41,11 @@ RC_ARM_CHANNEL = 6
 # that are within the debounce range
 DEBOUNCE_RANGE = 5
 
+# readings outside this range mean the receiver has lost the transmitter
+# (the rcio driver reports 0 without a signal)
+RC_VALID_LOW = RC_LOW - 100
+RC_VALID_HIGH = RC_HIGH + 100
+
 
 class RCControler(ApplicationSession):
     """Main entry point for controling the Mothership and AUV
@@ -80,12 +85,30 @@ class RCControler(ApplicationSession):
             )
             await asyncio.sleep(1 / self.update_frequency)
 
+    def _read_channel(self, ch):
+        """Read an rc channel, None if the read failed or there is no signal
+        """
+        try:
+            value = int(self.rc_input.read(ch=ch))
+        except (IndexError, OSError, ValueError) as e:
+            logger.warning('RC Control: failed to read channel {}: {}'.format(ch, e))
+            return None
+        if not RC_VALID_LOW <= value <= RC_VALID_HIGH:
+            return None
+        return value
+
     async def run(self):
         """Main controll loop
         """
         while True:
+            # wait a little bit until reading in a new command to prevent twichy controls
+            await asyncio.sleep(0.05)
+
             # check if the armed button is on/off
-            rc_armed = int(self.rc_input.read(ch=RC_ARM_CHANNEL))
+            rc_armed = self._read_channel(RC_ARM_CHANNEL)
+            if rc_armed is None:
+                # stop feeding the auv's command watchdog so it stops the motors
+                continue
             if rc_armed < ARMED_THRESHOLD and self.armed is True:
                 logger.info('RC Control: Disarmed')
                 self.call('nav.stop')
@@ -103,8 +126,10 @@ class RCControler(ApplicationSession):
 
             # only respond to commands when the rc is armed
             if self.armed:
-                rc_throttle = int(self.rc_input.read(ch=RC_THROTTLE_CHANNEL))
-                rc_turn = int(self.rc_input.read(ch=RC_TURN_CHANNEL))
+                rc_throttle = self._read_channel(RC_THROTTLE_CHANNEL)
+                rc_turn = self._read_channel(RC_TURN_CHANNEL)
+                if rc_throttle is None or rc_turn is None:
+                    continue
 
                 # only update if the signal has changed
                 if self.last_throttle_signal is not None and abs(rc_throttle - self.last_throttle_signal) > DEBOUNCE_RANGE:
@@ -139,5 +164,6 @@ class RCControler(ApplicationSession):
                 if self.last_turn_signal is None:
                     self.last_turn_signal = rc_turn
 
-            # wait a little bit until reading in a new command to prevent twichy controls
-            await asyncio.sleep(0.05)
+                # commands are only sent when the sticks move, keep the auv's
+                # command watchdog fed for as long as the sticks read fine
+                self.call('auv.keepalive')
@@ -32,9 +32,11 @@ class RouterProxy:
     published_topics_proxy = [
         'auv.update',
         'nav.update',
+        'nav.waypoints',
         'ahrs.update',
         'rc_control.update',
         'gps.update',
+        'config.changed',
         # add topics here to expose them to remote router
     ]
 
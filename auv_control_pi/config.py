@@ -1,3 +1,22 @@
 from .models import Configuration
 
+# the configuration is loaded once per process, changes made by any component
+# are broadcast on the `config.changed` topic and applied in place
 config = Configuration.get_solo()
+
+CONFIG_CHANGED_TOPIC = 'config.changed'
+
+
+def apply_config_changes(changes):
+    """Update the in-process config with changed fields without touching the database
+    """
+    for field, value in changes.items():
+        setattr(config, field, value)
+
+
+def update_config(session, **changes):
+    """Save changed config fields and publish them so other components can apply them
+    """
+    apply_config_changes(changes)
+    config.save(update_fields=list(changes))
+    session.publish(CONFIG_CHANGED_TOPIC, changes)
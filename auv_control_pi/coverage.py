@@ -0,0 +1,140 @@
+"""
+Coverage path generation over a survey area
+
+Patterns are computed with numpy in a local ENU frame (see geodesy.py)
+centered on the area and returned as lat/lng Points ready for the
+navigator.
+"""
+from math import radians, degrees, sin, cos, atan2, pi
+
+import numpy as np
+
+from .geodesy import LocalFrame
+from .spatial import PolygonGridIndex
+from .utils import Point
+
+LAWNMOWER = 'lawnmower'
+SPIRAL = 'spiral'
+PATTERNS = (LAWNMOWER, SPIRAL)
+
+
+def _to_enu(frame, vertices):
+    return np.array([frame.to_enu(Point(lat=lat, lng=lng)) for lat, lng in vertices], dtype=float)
+
+
+def _to_points(frame, enu):
+    lat = frame.origin.lat + enu[:, 1] / frame.north_scale
+    lng = (frame.origin.lng + enu[:, 0] / frame.east_scale + 180) % 360 - 180
+    return [Point(lat=float(a), lng=float(b)) for a, b in zip(lat, lng)]
+
+
+def _longest_edge_bearing(enu):
+    edges = np.roll(enu, -1, axis=0) - enu
+    east, north = edges[np.argmax(np.hypot(edges[:, 0], edges[:, 1]))]
+    return degrees(atan2(east, north)) % 360
+
+
+def sweep_segments(enu, spacing):
+    """Intersections of the polygon with horizontal sweep lines `spacing` apart
+
+    Returns (line, rank, x_start, x_end) arrays, one entry per stretch of a
+    sweep line inside the polygon. `rank` numbers the stretches of each line
+    from left to right, and the lines sit at y_min + (line + 0.5) * spacing.
+    """
+    a = enu
+    b = np.roll(enu, -1, axis=0)
+    y0 = enu[:, 1].min() + spacing / 2
+    lo = np.minimum(a[:, 1], b[:, 1])
+    hi = np.maximum(a[:, 1], b[:, 1])
+    # the lines crossing an edge are those with lo <= y < hi
+    first = np.ceil((lo - y0) / spacing).astype(int)
+    counts = np.maximum(np.ceil((hi - y0) / spacing).astype(int) - first, 0)
+
+    edge = np.repeat(np.arange(len(enu)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    line = first[edge] + offsets
+    keep = line >= 0
+    edge, line = edge[keep], line[keep]
+
+    y = y0 + line * spacing
+    ax, ay, bx, by = a[edge, 0], a[edge, 1], b[edge, 0], b[edge, 1]
+    x = ax + (y - ay) * (bx - ax) / (by - ay)
+
+    order = np.lexsort((x, line))
+    line, x = line[order], x[order]
+    # crossings pair up into entry/exit along each line
+    line = line[::2]
+    x_start, x_end = x[::2], x[1::2]
+    line_start = np.searchsorted(line, line, side='left')
+    rank = np.arange(len(line)) - line_start
+    return line, rank, x_start, x_end
+
+
+def lawnmower(vertices, spacing, angle=None):
+    """Boustrophedon pattern of parallel lines `spacing` meters apart over a polygon
+
+    `vertices` are the polygon's (lat, lng) pairs and `angle` the bearing of
+    the survey lines in degrees, which defaults to the direction of the
+    longest edge of the polygon. Where a line crosses the polygon more than
+    once (concave areas) each run of stretches with the same left-to-right
+    rank is covered in turn.
+    """
+    frame = LocalFrame(Point(*(float(v) for v in np.mean(vertices, axis=0))))
+    enu = _to_enu(frame, vertices)
+    if angle is None:
+        angle = _longest_edge_bearing(enu)
+    # x along the survey lines and y to their right, so lines are
+    # swept from left to right looking down the first line
+    a = radians(angle)
+    rotation = np.array([[sin(a), cos(a)], [cos(a), -sin(a)]])
+    rotated = enu @ rotation
+
+    line, rank, x_start, x_end = sweep_segments(rotated, spacing)
+    y0 = rotated[:, 1].min() + spacing / 2
+
+    legs = []
+    for r in range(int(rank.max()) + 1 if len(rank) else 0):
+        mask = rank == r
+        starts, ends, y = x_start[mask], x_end[mask], y0 + line[mask] * spacing
+        # reverse every other line
+        flip = np.arange(len(y)) % 2 == 1
+        starts, ends = np.where(flip, ends, starts), np.where(flip, starts, ends)
+        legs.append(np.stack([starts, y, ends, y], axis=1).reshape(-1, 2))
+    if not legs:
+        return []
+    path = np.concatenate(legs) @ rotation.T
+    return _to_points(frame, path)
+
+
+def spiral(vertices, spacing, step=None):
+    """Archimedean spiral with turns `spacing` meters apart covering a polygon, from the edge inwards
+
+    Waypoints are placed every `step` meters (defaults to `spacing`) along the
+    spiral and those outside the polygon are dropped, so areas should be
+    convex or the path will cut across the parts left out.
+    """
+    step = step or spacing
+    frame = LocalFrame(Point(*(float(v) for v in np.mean(vertices, axis=0))))
+    enu = _to_enu(frame, vertices)
+    radius = np.hypot(enu[:, 0], enu[:, 1]).max()
+    # r = b * theta with arc length ~ b * theta ** 2 / 2
+    b = spacing / (2 * pi)
+    length = b * (radius / b) ** 2 / 2
+    theta = np.sqrt(2 * np.arange(step, length, step) / b)
+    path = np.stack([b * theta * np.sin(theta), b * theta * np.cos(theta)], axis=1)[::-1]
+
+    index = PolygonGridIndex([tuple(vertex) for vertex in enu])
+    inside = np.fromiter((index.contains(position) for position in path), dtype=bool, count=len(path))
+    return _to_points(frame, path[inside])
+
+
+def generate(vertices, spacing, pattern=LAWNMOWER, **kwargs):
+    if len(vertices) < 3:
+        raise ValueError('A survey area needs at least 3 vertices')
+    if spacing <= 0:
+        raise ValueError('Line spacing must be positive')
+    if pattern == LAWNMOWER:
+        return lawnmower(vertices, spacing, **kwargs)
+    if pattern == SPIRAL:
+        return spiral(vertices, spacing, **kwargs)
+    raise ValueError('Unknown coverage pattern: {}'.format(pattern))
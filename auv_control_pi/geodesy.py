@@ -0,0 +1,132 @@
+"""
+Local tangent plane geodesy
+
+Points are projected into a flat east/north frame (in meters) centered on an
+origin, usually the start of a trip, using the WGS84 radii of curvature at
+the origin. Once a waypoint is projected, bearing and distance to it are a
+subtraction, an `atan2` and a `hypot`, instead of two iterative
+`pygc.great_distance` calls.
+
+Error versus `pygc.great_distance` for both points within the given range of
+the origin at 49N (see benchmarks/bench_geodesy.py):
+
+    range      distance error   bearing error
+    100 m      < 0.002 %        < 0.001 deg
+    1 km       < 0.02 %         < 0.01 deg
+    5 km       < 0.1 %          < 0.05 deg
+    10 km      < 0.2 %          < 0.1 deg
+
+Errors grow roughly linearly with the distance from the origin, so a new
+frame should be used for missions spanning more than a few tens of km.
+
+Mission legs are also planned in the local frame. Each `Leg` caches its
+bearing, length and unit vectors, so along/cross-track errors and the
+line-of-sight heading cost a dot and a cross product per control tick.
+"""
+from math import radians, degrees, sin, cos, sqrt, atan2, hypot
+
+from .utils import Point
+
+# WGS84 ellipsoid
+SEMI_MAJOR_AXIS = 6378137.0  # meters
+FLATTENING = 1 / 298.257223563
+ECCENTRICITY_SQ = FLATTENING * (2 - FLATTENING)
+
+
+def bearing_distance(start, end):
+    """Bearing [deg] and distance [m] between two (east, north) positions in the same frame
+    """
+    d_east = end[0] - start[0]
+    d_north = end[1] - start[1]
+    return degrees(atan2(d_east, d_north)) % 360, hypot(d_east, d_north)
+
+
+class LocalFrame:
+    """East/North/Up frame tangent to the ellipsoid at `origin` (the up axis is ignored)
+    """
+
+    def __init__(self, origin):
+        self.origin = origin
+        lat = radians(origin.lat)
+        w = sqrt(1 - ECCENTRICITY_SQ * sin(lat) ** 2)
+        meridian_radius = SEMI_MAJOR_AXIS * (1 - ECCENTRICITY_SQ) / w ** 3
+        normal_radius = SEMI_MAJOR_AXIS / w
+        # meters per degree of latitude/longitude at the origin
+        self.north_scale = radians(meridian_radius)
+        self.east_scale = radians(normal_radius * cos(lat))
+
+    def to_enu(self, point):
+        """Project a lat/lng Point to (east, north) meters from the origin
+        """
+        d_lng = (point.lng - self.origin.lng + 180) % 360 - 180
+        return d_lng * self.east_scale, (point.lat - self.origin.lat) * self.north_scale
+
+    def to_point(self, east, north):
+        """Inverse of `to_enu`
+        """
+        lng = self.origin.lng + east / self.east_scale
+        return Point(lat=self.origin.lat + north / self.north_scale,
+                     lng=(lng + 180) % 360 - 180)
+
+    def bearing_distance(self, point_a, point_b):
+        """Bearing [deg] and distance [m] from point_a to point_b
+        """
+        return bearing_distance(self.to_enu(point_a), self.to_enu(point_b))
+
+
+class Leg:
+    """Straight track between two (east, north) positions in a local frame
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.bearing, self.length = bearing_distance(start, end)
+        if self.length:
+            # along-track unit vector and the normal pointing right of the track
+            self.unit = ((end[0] - start[0]) / self.length, (end[1] - start[1]) / self.length)
+            self.normal = (self.unit[1], -self.unit[0])
+        else:
+            self.unit = self.normal = (0.0, 0.0)
+
+    def track_errors(self, position):
+        """Along-track distance from the start and cross-track error (positive right of the track) [m]
+        """
+        d_east = position[0] - self.start[0]
+        d_north = position[1] - self.start[1]
+        along = d_east * self.unit[0] + d_north * self.unit[1]
+        cross = d_east * self.normal[0] + d_north * self.normal[1]
+        return along, cross
+
+    def distance_to(self, position):
+        """Distance [m] from `position` to the closest point on the leg
+        """
+        along, cross = self.track_errors(position)
+        if along <= 0:
+            return hypot(position[0] - self.start[0], position[1] - self.start[1])
+        if along >= self.length:
+            return hypot(position[0] - self.end[0], position[1] - self.end[1])
+        return abs(cross)
+
+    def distance_to_end(self, along, cross):
+        return hypot(self.length - along, cross)
+
+    def reached_end(self, along, cross, radius):
+        """True within `radius` [m] of the end of the leg or once past it
+
+        Past the end the line of sight heading keeps pointing along the leg,
+        so a boat that misses the radius would otherwise never arrive.
+        """
+        return along >= self.length or self.distance_to_end(along, cross) <= radius
+
+    def los_heading(self, cross, lookahead):
+        """Line-of-sight heading [deg] to a point `lookahead` meters down the track
+        """
+        return (self.bearing - degrees(atan2(cross, lookahead))) % 360
+
+
+def plan_legs(frame, points):
+    """Legs between consecutive lat/lng points, projected into `frame`
+    """
+    positions = [frame.to_enu(point) for point in points]
+    return [Leg(start, end) for start, end in zip(positions, positions[1:])]
@@ -0,0 +1,47 @@
+"""
+Geofences checked against every GPS fix
+
+Each fence is projected into its own local frame and indexed once when it
+is loaded, so checking a fix costs a projection and a grid lookup rather
+than a pass over every vertex of the polygon.
+"""
+from .geodesy import LocalFrame
+from .spatial import PolygonGridIndex
+from .utils import Point
+
+
+class Fence:
+
+    def __init__(self, vertices, keep_in=True, name=''):
+        """`vertices` are the polygon's (lat, lng) pairs
+        """
+        if len(vertices) < 3:
+            raise ValueError('A geofence needs at least 3 vertices')
+        points = [Point(lat=lat, lng=lng) for lat, lng in vertices]
+        self.name = name
+        self.keep_in = keep_in
+        self.frame = LocalFrame(points[0])
+        self.index = PolygonGridIndex([self.frame.to_enu(point) for point in points])
+
+    @classmethod
+    def from_model(cls, geofence):
+        return cls(geofence.vertices, keep_in=geofence.keep_in, name=str(geofence))
+
+    def breached(self, point):
+        return self.index.contains(self.frame.to_enu(point)) != self.keep_in
+
+
+def breached_fences(fences, point):
+    """Names of the fences breached at a lat/lng Point
+    """
+    return [fence.name for fence in fences if fence.breached(point)]
+
+
+def breach_stops(breaches, previous, autopilot):
+    """True if the boat should be stopped given the fences breached now and at the last fix
+
+    The boat is stopped when a fence is first breached, and on every fix
+    while a fence is breached and the navigator is steering so the autopilot
+    can't carry it further out. Manual or RC driving can still bring it back.
+    """
+    return bool(set(breaches) - set(previous)) or bool(breaches and autopilot)
@@ -0,0 +1,227 @@
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from auv_control_pi import archive
+from auv_control_pi.compaction import bucket_start, rollup, windows
+from auv_control_pi.models import AUVLog, Configuration, GPSLog, TelemetryAggregate
+from auv_control_pi.telemetry import enable_wal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# numeric fields of each log model that are kept as aggregates
+COMPACTED_FIELDS = {
+    AUVLog: (
+        'left_motor_speed',
+        'left_motor_duty_cycle',
+        'right_motor_speed',
+        'right_motor_duty_cycle',
+        'throttle',
+        'turn_speed',
+    ),
+    GPSLog: (
+        'lat',
+        'lon',
+        'height_sea',
+        'height_ellipsoid',
+        'horizontal_accruacy',
+        'vertiacl_accruracy',
+    ),
+}
+
+# `PRAGMA auto_vacuum` value for incremental
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def store_aggregates(series, resolution, start, end):
+    """Roll each (source, field) series of samples up into buckets and save them
+
+    Late or clock-skewed rows can land in a bucket an earlier run already
+    stored, those buckets are merged with the new samples and replaced.
+    Returns the number of buckets that were merged.
+    """
+    existing = TelemetryAggregate.objects.filter(
+        resolution=resolution,
+        timestamp__gte=start,
+        timestamp__lt=end,
+        source__in={source for source, _ in series},
+    )
+    merged = []
+    for row in existing.values_list('pk', 'source', 'field', 'timestamp', 'mean', 'min', 'max', 'count'):
+        samples = series.get(row[1:3])
+        if samples is not None:
+            samples.append(row[3:])
+            merged.append(row[0])
+    for i in range(0, len(merged), 500):
+        TelemetryAggregate.objects.filter(pk__in=merged[i:i + 500]).delete()
+
+    aggregates = []
+    for (source, field), samples in series.items():
+        aggregates.extend(
+            TelemetryAggregate(source=source, field=field, resolution=resolution, timestamp=bucket,
+                               mean=mean, min=low, max=high, count=count)
+            for bucket, (mean, low, high, count) in rollup(samples, resolution).items()
+        )
+    TelemetryAggregate.objects.bulk_create(aggregates, batch_size=500)
+    return len(merged)
+
+
+def compact_log(model, fields, cutoff):
+    """Roll log rows older than `cutoff` up into per second aggregates and delete them
+    """
+    source = model._meta.model_name
+    old_rows = model.objects.filter(timestamp__lt=cutoff)
+    first = old_rows.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if first is None:
+        return 0
+
+    deleted = 0
+    # an hour at a time to keep memory bounded, windows start on whole minutes
+    # so no second is split between two windows
+    for start, end in windows(bucket_start(first, 60), cutoff):
+        with transaction.atomic():
+            rows = model.objects.filter(timestamp__gte=start, timestamp__lt=end)
+            samples = list(rows.order_by('timestamp').values_list('timestamp', *fields))
+            if not samples:
+                continue
+            series = {
+                (source, field): [(sample[0], _float(sample[i]), _float(sample[i]), _float(sample[i]), 1)
+                                  for sample in samples]
+                for i, field in enumerate(fields, start=1)
+            }
+            merged = store_aggregates(series, TelemetryAggregate.RESOLUTION_SECOND, start, end)
+            if merged:
+                logger.info('Merged late {} rows into {} per second aggregates'.format(model.__name__, merged))
+            deleted += rows.delete()[0]
+    return deleted
+
+
+def compact_seconds(cutoff):
+    """Roll per second aggregates older than `cutoff` up into per minute ones
+    """
+    old = TelemetryAggregate.objects.filter(
+        resolution=TelemetryAggregate.RESOLUTION_SECOND,
+        timestamp__lt=cutoff,
+    )
+    first = old.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if first is None:
+        return 0
+
+    deleted = 0
+    for start, end in windows(bucket_start(first, 60), cutoff):
+        with transaction.atomic():
+            seconds = old.filter(timestamp__gte=start, timestamp__lt=end)
+            series = {}
+            for row in seconds.order_by('timestamp').values_list(
+                    'source', 'field', 'timestamp', 'mean', 'min', 'max', 'count'):
+                series.setdefault(row[:2], []).append(row[2:])
+            merged = store_aggregates(series, TelemetryAggregate.RESOLUTION_MINUTE, start, end)
+            if merged:
+                logger.info('Merged late per second aggregates into {} per minute ones'.format(merged))
+            deleted += seconds.delete()[0]
+    return deleted
+
+
+def expire_minutes(cutoff):
+    return TelemetryAggregate.objects.filter(
+        resolution=TelemetryAggregate.RESOLUTION_MINUTE,
+        timestamp__lt=cutoff,
+    ).delete()[0]
+
+
+def vacuum():
+    """Give the space freed by deleted rows back to the filesystem
+
+    The first run switches the database to incremental auto-vacuum, which
+    takes one full VACUUM. After that only the free pages are released
+    instead of rewriting the whole database every run.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            cursor.execute('VACUUM')
+        else:
+            # execute() only steps the pragma once, freeing a single page,
+            # executescript() runs it to completion
+            connection.connection.executescript('PRAGMA incremental_vacuum;')
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+def _cutoff(now, **age):
+    # on a whole minute so compaction never splits a bucket between runs
+    return bucket_start(now - timedelta(**age), TelemetryAggregate.RESOLUTION_MINUTE)
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _db_size():
+    name = connection.settings_dict['NAME']
+    return sum(os.path.getsize(path) for path in (name, name + '-wal') if os.path.exists(path))
+
+
+class Command(BaseCommand):
+    """Keep the telemetry tables from growing without limit
+
+    Log rows older than `Configuration.telemetry_raw_hours` are rolled up into
+    per second aggregates, per second aggregates older than
+    `telemetry_second_days` into per minute ones, and per minute aggregates
+    older than `telemetry_minute_days` are deleted. The free pages are then
+    released (see `vacuum`) if anything was deleted.
+
+    Chunks of the numpy archive in `settings.ARCHIVE_DIR` older than
+    `archive_days` are deleted too.
+    """
+    help = 'Roll old telemetry up into per second and per minute aggregates, delete expired archive chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', type=float, default=0,
+                            help='run again every LOOP hours instead of once')
+        parser.add_argument('--no-vacuum', action='store_true',
+                            help="don't vacuum the database after deleting rows")
+
+    def handle(self, *args, **options):
+        enable_wal()
+        while True:
+            self.compact(vacuum_db=not options['no_vacuum'])
+            if not options['loop']:
+                break
+            # close the connection while idle so it doesn't hold the wal open
+            connection.close()
+            time.sleep(options['loop'] * 3600)
+
+    def compact(self, vacuum_db=True):
+        start = time.monotonic()
+        config = Configuration.get_solo()
+        now = timezone.now()
+        deleted = 0
+        for model, fields in COMPACTED_FIELDS.items():
+            rows = compact_log(model, fields, _cutoff(now, hours=config.telemetry_raw_hours))
+            logger.info('Rolled up {} {} rows'.format(rows, model.__name__))
+            deleted += rows
+        rows = compact_seconds(_cutoff(now, days=config.telemetry_second_days))
+        logger.info('Rolled up {} per second aggregates'.format(rows))
+        deleted += rows
+        rows = expire_minutes(_cutoff(now, days=config.telemetry_minute_days))
+        logger.info('Deleted {} expired per minute aggregates'.format(rows))
+        deleted += rows
+        cutoff = now - timedelta(days=config.archive_days)
+        chunks, nbytes = archive.prune(settings.ARCHIVE_DIR, cutoff.timestamp())
+        logger.info('Deleted {} expired archive chunks ({:.1f} MB)'.format(chunks, nbytes / 1e6))
+
+        if deleted and vacuum_db:
+            size = _db_size()
+            vacuum()
+            logger.info('Vacuumed database from {:.1f} MB to {:.1f} MB'.format(size / 1e6, _db_size() / 1e6))
+        logger.info('Compaction took {:.1f} s'.format(time.monotonic() - start))
@@ -0,0 +1,30 @@
+import logging
+
+from autobahn.asyncio.component import Component, run
+from django.core.management.base import BaseCommand
+from auv_control_pi.components.auv_control import AUV
+from auv_control_pi.components.navigation import Navitgator
+
+logging.basicConfig(level=logging.INFO)
+
+
+class Command(BaseCommand):
+    """Run the navigator and AUV control in one process
+
+    Steering calls from the navigator go straight to the motor mixing
+    instead of through the router, the RPCs are still registered for
+    remote clients.
+    """
+
+    def handle(self, *args, **options):
+        auv_comp = Component(
+            transports="ws://crossbar:8080/ws",
+            realm="realm1",
+            session_factory=AUV,
+        )
+        nav_comp = Component(
+            transports="ws://crossbar:8080/ws",
+            realm="realm1",
+            session_factory=Navitgator,
+        )
+        run([auv_comp, nav_comp])
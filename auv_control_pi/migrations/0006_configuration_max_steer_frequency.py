@@ -0,0 +1,18 @@
+# Generated by Django 2.1 on 2018-12-02 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0005_configuration_board_offset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuration',
+            name='max_steer_frequency',
+            field=models.FloatField(blank=True, default=20),
+        ),
+    ]
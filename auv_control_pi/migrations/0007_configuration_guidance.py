@@ -0,0 +1,23 @@
+# Generated by Django 2.1 on 2018-12-04 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0006_configuration_max_steer_frequency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuration',
+            name='guidance_mode',
+            field=models.CharField(choices=[('pursuit', 'Steer at the target waypoint'), ('los', 'Line of sight along the mission leg')], default='pursuit', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='configuration',
+            name='los_lookahead',
+            field=models.FloatField(blank=True, default=20),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.1 on 2018-12-08 22:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0007_configuration_guidance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Mission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('current_waypoint', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Waypoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('mission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waypoints', to='auv_control_pi.Mission')),
+            ],
+            options={
+                'ordering': ('index',),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='waypoint',
+            unique_together={('mission', 'index')},
+        ),
+        migrations.AddField(
+            model_name='configuration',
+            name='active_mission',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='auv_control_pi.Mission'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.1 on 2018-12-11 03:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0008_mission_waypoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Geofence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('polygon', models.TextField()),
+                ('keep_in', models.BooleanField(default=True)),
+                ('enabled', models.BooleanField(default=True)),
+                ('mission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='geofences', to='auv_control_pi.Mission')),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.1 on 2018-12-15 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0009_geofence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrustCalibration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motor', models.CharField(max_length=32, unique=True)),
+                ('table', models.TextField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
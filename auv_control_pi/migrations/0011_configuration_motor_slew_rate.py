@@ -0,0 +1,23 @@
+# Generated by Django 2.1 on 2018-12-16 21:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0010_thrustcalibration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuration',
+            name='left_motor_slew_rate',
+            field=models.FloatField(blank=True, default=200),
+        ),
+        migrations.AddField(
+            model_name='configuration',
+            name='right_motor_slew_rate',
+            field=models.FloatField(blank=True, default=200),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1 on 2018-12-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0011_configuration_motor_slew_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuration',
+            name='command_timeout_ms',
+            field=models.IntegerField(blank=True, default=1000),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.1 on 2018-12-19 05:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0012_configuration_command_timeout_ms'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auvlog',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='auvlog',
+            name='left_motor_duty_cycle',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='auvlog',
+            name='right_motor_duty_cycle',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gpslog',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='gpslog',
+            name='height_sea',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gpslog',
+            name='height_ellipsoid',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gpslog',
+            name='horizontal_accruacy',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gpslog',
+            name='vertiacl_accruracy',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.1 on 2018-12-20 03:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0013_telemetry_log_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetryAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=32)),
+                ('field', models.CharField(max_length=64)),
+                ('resolution', models.PositiveIntegerField()),
+                ('timestamp', models.DateTimeField(db_index=True)),
+                ('mean', models.FloatField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('count', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='telemetryaggregate',
+            unique_together={('source', 'field', 'resolution', 'timestamp')},
+        ),
+        migrations.AddField(
+            model_name='configuration',
+            name='telemetry_raw_hours',
+            field=models.FloatField(blank=True, default=24),
+        ),
+        migrations.AddField(
+            model_name='configuration',
+            name='telemetry_second_days',
+            field=models.FloatField(blank=True, default=7),
+        ),
+        migrations.AddField(
+            model_name='configuration',
+            name='telemetry_minute_days',
+            field=models.FloatField(blank=True, default=365),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1 on 2018-12-21 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auv_control_pi', '0014_telemetry_aggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuration',
+            name='archive_days',
+            field=models.FloatField(blank=True, default=30),
+        ),
+    ]
@@ -0,0 +1,77 @@
+"""
+Persisted missions
+
+Waypoints are uploaded in chunks with `upload_waypoints` and the index of
+the waypoint being steered towards is saved with `save_progress` as the
+mission runs, so after a restart the active mission can be loaded again as
+a `MissionPlan` and rejoined where it was left off.
+"""
+from django.db import transaction
+
+from .geodesy import LocalFrame, plan_legs
+from .models import Mission, Waypoint
+from .spatial import LegGridIndex
+from .utils import Point
+
+WAYPOINT_BATCH_SIZE = 500
+
+
+def upload_waypoints(mission_id, offset, waypoints):
+    """Add a chunk of waypoints to a mission
+
+    `offset` is the index of the first waypoint of the chunk within the
+    mission. Uploading the same chunk again (e.g. retrying after a lost
+    reply) replaces it rather than failing on the duplicate indexes.
+    Returns the number of waypoints the mission now has.
+    """
+    with transaction.atomic():
+        Waypoint.objects.filter(
+            mission_id=mission_id,
+            index__gte=offset,
+            index__lt=offset + len(waypoints),
+        ).delete()
+        Waypoint.objects.bulk_create(
+            [Waypoint(mission_id=mission_id, index=offset + i, lat=waypoint['lat'], lng=waypoint['lng'])
+             for i, waypoint in enumerate(waypoints)],
+            batch_size=WAYPOINT_BATCH_SIZE,
+        )
+        return Waypoint.objects.filter(mission_id=mission_id).count()
+
+
+def save_progress(mission, current_waypoint):
+    mission.current_waypoint = current_waypoint
+    Mission.objects.filter(pk=mission.pk).update(current_waypoint=current_waypoint)
+
+
+class MissionPlan:
+    """A mission's waypoints with the legs between them planned and indexed
+
+    Raises ValueError if the mission has no waypoints.
+    """
+
+    def __init__(self, mission):
+        self.mission = mission
+        self.points = [Point(lat=lat, lng=lng) for lat, lng in mission.waypoints.values_list('lat', 'lng')]
+        if not self.points:
+            raise ValueError('{} has no waypoints'.format(mission))
+        # missions get their own frame centered on the first waypoint
+        # so the planned legs don't depend on where the boat was
+        self.frame = LocalFrame(self.points[0])
+        self.legs = plan_legs(self.frame, self.points)
+        self.leg_index = LegGridIndex(self.legs)
+
+    def rejoin(self, location):
+        """(waypoint index, leg) to continue along from `location`, or None
+
+        Picks the leg closest to `location`, skipping legs before the one
+        leading to the last saved waypoint so we don't repeat finished parts
+        of the mission that pass nearby.
+        """
+        if not self.legs:
+            return None
+        first = max(self.mission.current_waypoint - 1, 0)
+        i, _ = self.leg_index.nearest(self.frame.to_enu(location), first=first)
+        if i is None:
+            return None
+        # leg i runs from waypoint i to waypoint i + 1
+        return i + 1, self.legs[i]
@@ -1,7 +1,61 @@
+import json
+
 from django.db import models
+from django.utils import timezone
 from solo.models import SingletonModel
 
 
+GUIDANCE_PURSUIT = 'pursuit'
+GUIDANCE_LOS = 'los'
+GUIDANCE_MODES = (
+    (GUIDANCE_PURSUIT, 'Steer at the target waypoint'),
+    (GUIDANCE_LOS, 'Line of sight along the mission leg'),
+)
+
+
+class Mission(models.Model):
+
+    name = models.CharField(max_length=255, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    # index of the waypoint being steered towards, saved as the mission progresses
+    current_waypoint = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.name or 'Mission {}'.format(self.pk)
+
+
+class Waypoint(models.Model):
+
+    mission = models.ForeignKey(Mission, related_name='waypoints', on_delete=models.CASCADE)
+    index = models.IntegerField()
+    lat = models.FloatField()
+    lng = models.FloatField()
+
+    class Meta:
+        ordering = ('index',)
+        unique_together = ('mission', 'index')
+
+
+class Geofence(models.Model):
+
+    name = models.CharField(max_length=255, blank=True)
+    # JSON list of [lat, lng] polygon vertices
+    polygon = models.TextField()
+    # keep in fences must contain the boat, keep out fences must not
+    keep_in = models.BooleanField(default=True)
+    enabled = models.BooleanField(default=True)
+    # fences without a mission always apply
+    mission = models.ForeignKey(Mission, related_name='geofences', blank=True, null=True,
+                                on_delete=models.CASCADE)
+
+    def __str__(self):
+        return self.name or 'Geofence {}'.format(self.pk)
+
+    @property
+    def vertices(self):
+        return [tuple(vertex) for vertex in json.loads(self.polygon)]
+
+
 class Configuration(SingletonModel):
 
     auv_id = models.UUIDField(blank=True, null=True)
@@ -10,6 +64,11 @@ class Configuration(SingletonModel):
                                            max_digits=5, decimal_places=3)
     left_motor_channel = models.IntegerField(default=0)
     right_motor_channel = models.IntegerField(default=1)
+    # max rate of change of each motor's output [% / s], 0 for no limit
+    left_motor_slew_rate = models.FloatField(blank=True, default=200)
+    right_motor_slew_rate = models.FloatField(blank=True, default=200)
+    # motors are stopped if no command or keepalive arrives for this long, 0 disables it
+    command_timeout_ms = models.IntegerField(blank=True, default=1000)
     trim = models.IntegerField(default=0)
     name = models.CharField(max_length=255, blank=True)
     address = models.CharField(max_length=255, blank=True)
@@ -22,6 +81,24 @@ class Configuration(SingletonModel):
     kD = models.FloatField(blank=True, default=0)
     target_waypoint_distance = models.FloatField(blank=True, default=60)
     pid_error_debounce = models.FloatField(blank=True, default=5)
+    # max rate [Hz] of steering steps triggered by heading updates,
+    # 0 steers on a fixed timer instead
+    max_steer_frequency = models.FloatField(blank=True, default=20)
+    guidance_mode = models.CharField(max_length=16, choices=GUIDANCE_MODES, default=GUIDANCE_PURSUIT)
+    # distance [m] down the track the line of sight guidance steers towards
+    los_lookahead = models.FloatField(blank=True, default=20)
+    # mission to resume after a restart
+    active_mission = models.ForeignKey(Mission, blank=True, null=True, on_delete=models.SET_NULL)
+
+    # telemetry retention, see the compacttelemetry command
+    # full rate log rows are kept this long before being rolled up to per second aggregates
+    telemetry_raw_hours = models.FloatField(blank=True, default=24)
+    # per second aggregates are rolled up to per minute after this long
+    telemetry_second_days = models.FloatField(blank=True, default=7)
+    # per minute aggregates are deleted after this long
+    telemetry_minute_days = models.FloatField(blank=True, default=365)
+    # chunks of the high rate numpy archive (see auv_control_pi.archive) are deleted after this long
+    archive_days = models.FloatField(blank=True, default=30)
 
     magbias_x = models.FloatField(blank=True, default=0)
     magbias_y = models.FloatField(blank=True, default=0)
@@ -36,24 +113,64 @@ class Configuration(SingletonModel):
         verbose_name = "AUV Configuration"
 
 
+class ThrustCalibration(models.Model):
+
+    motor = models.CharField(max_length=32, unique=True)
+    # JSON list of [thrust percent, pulse width us] measurements
+    table = models.TextField()
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return '{} motor thrust calibration'.format(self.motor.title())
+
+    @property
+    def points(self):
+        return [tuple(point) for point in json.loads(self.table)]
+
+
 class AUVLog(models.Model):
 
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # rows are written in batches so the time is taken when the row is queued
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     left_motor_speed = models.IntegerField(blank=True, null=True)
-    left_motor_duty_cycle = models.IntegerField(blank=True, null=True)
+    left_motor_duty_cycle = models.FloatField(blank=True, null=True)
     right_motor_speed = models.IntegerField(blank=True, null=True)
-    right_motor_duty_cycle = models.IntegerField(blank=True, null=True)
+    right_motor_duty_cycle = models.FloatField(blank=True, null=True)
     throttle = models.IntegerField(blank=True, null=True)
     turn_speed = models.IntegerField(blank=True, null=True)
 
 
 class GPSLog(models.Model):
 
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     lat = models.DecimalField(max_digits=9, decimal_places=6)
     lon = models.DecimalField(max_digits=9, decimal_places=6)
-    height_sea = models.DecimalField(max_digits=9, decimal_places=6)
-    height_ellipsoid = models.DecimalField(max_digits=9, decimal_places=6)
-    horizontal_accruacy = models.DecimalField(max_digits=9, decimal_places=6)
-    vertiacl_accruracy = models.DecimalField(max_digits=9, decimal_places=6)
+    # accuracies are in the thousands of km before the first fix
+    height_sea = models.FloatField(blank=True, null=True)
+    height_ellipsoid = models.FloatField(blank=True, null=True)
+    horizontal_accruacy = models.FloatField(blank=True, null=True)
+    vertiacl_accruracy = models.FloatField(blank=True, null=True)
+
+
+class TelemetryAggregate(models.Model):
+    """Mean, min and max of one logged field over a second or a minute
+    """
+    RESOLUTION_SECOND = 1
+    RESOLUTION_MINUTE = 60
 
+    # name of the log model the samples came from, e.g. auvlog
+    source = models.CharField(max_length=32)
+    field = models.CharField(max_length=64)
+    resolution = models.PositiveIntegerField()  # [s]
+    # start of the bucket
+    timestamp = models.DateTimeField(db_index=True)
+    mean = models.FloatField()
+    min = models.FloatField()
+    max = models.FloatField()
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('source', 'field', 'resolution', 'timestamp')
+
+    def __str__(self):
+        return '{}.{} @ {} ({} s)'.format(self.source, self.field, self.timestamp, self.resolution)
@@ -1,7 +1,9 @@
 import os
+import asyncio
 import logging
 import time
-from threading import Thread
+from bisect import bisect_left
+from contextlib import contextmanager
 
 from navio.pwm import PWM
 
@@ -25,8 +27,19 @@ T100_PWM_MAP = {
     'max_reverse': 1475 - int((1475 - 1100) * 0.9),  # limit max mower to avoid burning out motor
 }
 
-SERVO_PWM_MAP = T100_PWM_MAP
+# standard hobby servo range centered on 1500 us
+SERVO_PWM_MAP = {
+    'max_forward': 2000,
+    'min_forward': 1500,
+    'stopped': 1500,
+    'min_reverse': 1500,
+    'max_reverse': 1000,
+}
 PWM_FREQUENCY = 50  # Hz
+# the ESC's need the duty cycle re-sent at least this often as a heartbeat
+HEARTBEAT_FREQUENCY = 10  # Hz
+# how long the stop signal is held to arm the ESC's
+ARMING_TIME = 1  # s
 
 
 def _calculate_value_in_range(min_val, max_val, percentage):
@@ -40,10 +53,77 @@ def _calculate_value_in_range(min_val, max_val, percentage):
     return min_val + int(percentage * value_range)
 
 
+def _duty_cycle_from_pwm_map(pwm_map, value):
+    duty_cycle = pwm_map['stopped']
+    if value > 0:
+        duty_cycle = _calculate_value_in_range(
+            min_val=pwm_map['min_forward'],
+            max_val=pwm_map['max_forward'],
+            percentage=value / 100,
+        )
+
+    elif value < 0:
+        duty_cycle = _calculate_value_in_range(
+            min_val=pwm_map['min_reverse'],
+            max_val=pwm_map['max_reverse'],
+            percentage=abs(value) / 100,
+        )
+    return duty_cycle
+
+
+class ThrustCurve:
+    """Lookup table of pulse width [us] for each whole percent of thrust from -100 to 100
+
+    Pulse widths for fractional percentages are interpolated between the
+    neighbouring entries.
+    """
+
+    def __init__(self, pulse_widths):
+        if len(pulse_widths) != 201:
+            raise ValueError('A thrust curve needs a pulse width for every percent from -100 to 100')
+        self.pulse_widths = list(pulse_widths)
+
+    @classmethod
+    def from_pwm_map(cls, pwm_map):
+        """Linear mapping between the end points of a pwm map
+        """
+        return cls([_duty_cycle_from_pwm_map(pwm_map, percent) for percent in range(-100, 101)])
+
+    @classmethod
+    def from_calibration(cls, table, pwm_map):
+        """Interpolate a calibration table of (thrust percent, pulse width us) measurements
+
+        Pulse widths are kept within the limits of `pwm_map`.
+        """
+        table = sorted((float(percent), float(pulse_width)) for percent, pulse_width in table)
+        if len(table) < 2:
+            raise ValueError('A thrust calibration needs at least 2 points')
+        if table[0][0] < -100 or table[-1][0] > 100:
+            raise ValueError('Thrust calibration percentages must be between -100 and 100')
+        percents = [percent for percent, _ in table]
+        low, high = pwm_map['max_reverse'], pwm_map['max_forward']
+
+        pulse_widths = []
+        for percent in range(-100, 101):
+            i = min(max(bisect_left(percents, percent), 1), len(table) - 1)
+            (x0, y0), (x1, y1) = table[i - 1], table[i]
+            pulse_width = y0 + (y1 - y0) * (percent - x0) / (x1 - x0) if x1 != x0 else y1
+            pulse_widths.append(min(max(pulse_width, low), high))
+        return cls(pulse_widths)
+
+    def pulse_width(self, percent):
+        x = percent + 100
+        i = int(x)
+        if i >= 200:
+            return self.pulse_widths[200]
+        low = self.pulse_widths[i]
+        return low + (self.pulse_widths[i + 1] - low) * (x - i)
+
+
 class Motor:
     """An interface class to allow simple acces to motor functions"""
 
-    def __init__(self, name, rc_channel, motor_type=T100):
+    def __init__(self, name, rc_channel, motor_type=T100, scheduler=None, pwm=None, slew_rate=None):
         self.name = name
         self.rc_channel = rc_channel
         if motor_type == T100:
@@ -52,25 +132,33 @@ class Motor:
             self.pwm_map = SERVO_PWM_MAP
         else:
             raise ValueError('Unknown motor_type')
+        self.thrust_curve = ThrustCurve.from_pwm_map(self.pwm_map)
 
         self._speed = 0
+        # speed currently output, which trails `speed` when slew limited
+        self.output_speed = 0
+        # max change in output speed [%/s], None for no limit
+        self.slew_rate = slew_rate
         self.duty_cycle_ms = self.pwm_map['stopped'] / 1000
 
-        self.pwm = PWM(self.rc_channel - 1)
+        self.pwm = pwm or PWM(self.rc_channel - 1)
         self.initialized = False
+        # duty cycle last written to the channel
+        self.written_duty_cycle_ms = None
 
-        # start the update loop in a thread
-        Thread(target=self._update).start()
+        self.scheduler = None
+        if scheduler is not None:
+            scheduler.add(self)
 
-    def initialize(self):
+    async def arm(self, arming_time=None):
         """Must call to initialize the motor
 
-        We run the initialization sequence in a thread to avoid blocking
-        the caller since this can take a few seconds.
-        """
-        Thread(target=self._initialize).start()
+        To arm the ESC a "stop signal" is sent and held for 1s (up to 2s works too).
+        If you wait too long after the arming process to send the fist command to the ESC,
+        it will shut off and you will have to re-initialize.
 
-    def _initialize(self):
+        Speeds set while arming are kept and written once the motor is armed.
+        """
         if pi:
             self.pwm.initialize()
 
@@ -78,26 +166,23 @@ class Motor:
             self.pwm.set_period(PWM_FREQUENCY)
             self.pwm.enable()
 
-            # To arm the ESC a "stop signal" is sent and held for 1s (up to 2s works too)
-            # if you wait too long after the arming process to send the fist command to the ESC,
-            # it will shut off and you will have to re-initialize
-            self.stop()
-            self.pwm.set_duty_cycle(self.duty_cycle_ms)
-            time.sleep(1)
+            stopped = self.pwm_map['stopped'] / 1000
+            self.pwm.set_duty_cycle(stopped)
+            self.written_duty_cycle_ms = stopped
+            await asyncio.sleep(ARMING_TIME if arming_time is None else arming_time)
         logger.debug('{} Motor: initialized'.format(self.name.title()))
         self.initialized = True
 
-    def _update(self):
-        """Set the duty cycle on the motor controllers
+    @property
+    def changed(self):
+        return self.duty_cycle_ms != self.written_duty_cycle_ms
 
-        The ESC's need to get a signal sent consistently as a heartbeat
-        and thus have the duty cycle set every loop.
+    def write(self):
+        """Set the duty cycle on the motor controller
         """
-        while True:
-            if pi and self.initialized:
-                self.pwm.set_duty_cycle(self.duty_cycle_ms)
-            # sleep a bit to avoid jitter in the speed
-            time.sleep(0.1)
+        if pi and self.initialized:
+            self.pwm.set_duty_cycle(self.duty_cycle_ms)
+            self.written_duty_cycle_ms = self.duty_cycle_ms
 
     @property
     def speed(self):
@@ -108,40 +193,229 @@ class Motor:
         """Must be value betweeon -100 and 100
 
         Negative values indicate the motor is running in reverse.
+        When slew limited the output ramps to the new speed from the scheduler.
         """
         # clamp the speed between -100 and 100
         value = max(-100, value)
         value = min(100, value)
 
-        duty_cycle = self.pwm_map['stopped']
-        if value > 0:
-            duty_cycle = _calculate_value_in_range(
-                min_val=self.pwm_map['min_forward'],
-                max_val=self.pwm_map['max_forward'],
-                percentage=value / 100,
-            )
-
-        elif value < 0:
-            duty_cycle = _calculate_value_in_range(
-                min_val=self.pwm_map['min_reverse'],
-                max_val=self.pwm_map['max_reverse'],
-                percentage=abs(value) / 100,
-            )
-
         self._speed = value
+        if not (self.slew_rate and self.scheduler is not None):
+            self._set_output(value)
+        if self.scheduler is not None and (self.changed or self.ramping):
+            self.scheduler.motor_changed(self)
+
+    @property
+    def ramping(self):
+        return self.output_speed != self._speed
+
+    def step(self, dt):
+        """Move the output speed towards the commanded speed by at most `slew_rate` * dt
+
+        The output holds at stop until the motor is armed so the ramp starts from there.
+        """
+        if not self.initialized:
+            return
+        max_change = self.slew_rate * dt if self.slew_rate else 200
+        change = max(-max_change, min(max_change, self._speed - self.output_speed))
+        self._set_output(self.output_speed + change)
+
+    def _set_output(self, value):
+        duty_cycle = round(self.thrust_curve.pulse_width(value))
+        self.output_speed = value
         self.duty_cycle_ms = duty_cycle / 1000  # convert to milliseconds
         logger.debug('{} Motor: speed updated to ({} %, {} us)'.format(self.name.title(), value, self.duty_cycle_ms))
 
+    def set_thrust_calibration(self, table=None):
+        """Map speed to pulse width through a calibration table of (thrust percent, pulse width us) points
+
+        Without a table speed is mapped linearly between the pwm map end points.
+        """
+        if table:
+            self.thrust_curve = ThrustCurve.from_calibration(table, self.pwm_map)
+        else:
+            self.thrust_curve = ThrustCurve.from_pwm_map(self.pwm_map)
+        # re-apply the current output through the new curve
+        self._set_output(self.output_speed)
+        if self.scheduler is not None and self.changed:
+            self.scheduler.motor_changed(self)
+
     def forward(self, speed):
         self.speed = abs(speed)
 
     def reverse(self, speed):
         self.speed = -abs(speed)
 
-    def stop(self):
-        self.speed = 0
+    def stop(self, immediate=False):
+        if immediate:
+            self._speed = 0
+            self._set_output(0)
+        else:
+            self.speed = 0
 
     def __repr__(self):
         return 'Motor(name={}, rc_channel={})'.format(self.name, self.rc_channel)
 
     __str__ = __repr__
+
+
+class PWMScheduler:
+    """Owns the motor PWM channels and keeps them refreshed from a single asyncio task
+
+    Every channel is re-written at `refresh_frequency` on fixed deadlines as
+    the ESC heartbeat. With `write_through` a speed change is written to the
+    channel by the setter itself, otherwise it wakes the task so it is
+    written on the next loop iteration. Changes made inside `batch()` are
+    written together when the batch ends.
+
+    Slew limited motors are stepped towards their commanded speed at
+    `PWM_FREQUENCY` for as long as they are ramping.
+
+    `arm()` arms every motor concurrently. Speed changes made while arming are
+    written as soon as the motors are armed.
+    """
+
+    def __init__(self, refresh_frequency=HEARTBEAT_FREQUENCY, write_through=False, clock=time.monotonic):
+        self.refresh_period = 1 / refresh_frequency
+        self.ramp_period = 1 / PWM_FREQUENCY
+        self.write_through = write_through
+        self.clock = clock
+        self.motors = []
+        self.refreshes = 0
+        self.commits = 0
+        self._batch_depth = 0
+        self._last_step = None
+        self._changed = None
+        self._running = False
+        self._task = None
+        # clock time at which arming finished and how long it took [s]
+        self.armed_at = None
+        self.arming_time = None
+
+    def add(self, motor):
+        self.motors.append(motor)
+        motor.scheduler = self
+
+    def notify(self):
+        """Wake the scheduler to write changed duty cycles
+        """
+        if self._changed is not None:
+            self._changed.set()
+
+    def motor_changed(self, motor):
+        if self._batch_depth:
+            return
+        if motor.ramping:
+            self.notify()
+        elif self.write_through:
+            motor.write()
+            self.commits += 1
+        else:
+            self.notify()
+
+    @contextmanager
+    def batch(self):
+        """Hold back speed changes and write them all at once when the block exits
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                if self.write_through:
+                    self.write_changed()
+                if not self.write_through or self.ramping:
+                    self.notify()
+
+    def write_changed(self):
+        changed = [motor for motor in self.motors if motor.changed]
+        for motor in changed:
+            motor.write()
+        if changed:
+            self.commits += 1
+
+    @property
+    def ramping(self):
+        return any(motor.ramping for motor in self.motors)
+
+    def step(self):
+        """Step the output of ramping motors and write the changes
+
+        Returns True while any motor is still ramping.
+        """
+        now = self.clock()
+        # a ramp starting from rest takes one nominal step straight away
+        dt = now - self._last_step if self._last_step is not None else self.ramp_period
+        for motor in self.motors:
+            if motor.ramping:
+                motor.step(dt)
+        self.write_changed()
+        ramping = self.ramping
+        self._last_step = now if ramping else None
+        return ramping
+
+    @property
+    def armed(self):
+        return self.armed_at is not None
+
+    async def arm(self, arming_time=None):
+        """Arm all motors at once and write the speeds commanded in the meantime
+        """
+        start = self.clock()
+        await asyncio.gather(*(motor.arm(arming_time) for motor in self.motors))
+        self.armed_at = self.clock()
+        self.arming_time = self.armed_at - start
+        logger.info('Motors armed in {:.0f} ms'.format(self.arming_time * 1e3))
+        self.write_changed()
+        if self.ramping:
+            self.notify()
+
+    def refresh(self):
+        for motor in self.motors:
+            motor.write()
+        self.refreshes += 1
+
+    async def run(self):
+        self._changed = asyncio.Event()
+        self._running = True
+        deadline = self.clock() + self.refresh_period
+        ramping = False
+        while self._running:
+            wake = deadline
+            if ramping:
+                wake = min(wake, self._last_step + self.ramp_period)
+            try:
+                await asyncio.wait_for(self._changed.wait(), max(wake - self.clock(), 0))
+            except asyncio.TimeoutError:
+                pass
+            if not self._running:
+                break
+            if self._changed.is_set() or ramping:
+                self._changed.clear()
+                ramping = self.step()
+
+            now = self.clock()
+            if now >= deadline:
+                self.refresh()
+                deadline += self.refresh_period
+                # don't try to catch up on heartbeats missed while the loop was busy
+                if deadline <= now:
+                    deadline = now + self.refresh_period
+
+    def start(self):
+        self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    def stop(self):
+        """Stop all motors, write the stop signal and end the refresh task
+        """
+        self._running = False
+        for motor in self.motors:
+            motor.stop(immediate=True)
+        self.refresh()
+        self.notify()
+
+    async def join(self):
+        if self._task is not None:
+            await self._task
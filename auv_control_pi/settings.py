@@ -86,6 +86,9 @@ DATABASES = {
     }
 }
 
+# high rate telemetry is archived to numpy chunk files, see auv_control_pi.archive
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
@@ -0,0 +1,182 @@
+"""
+Spatial indexes over local frame geometry (see geodesy.py)
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from math import floor, sqrt, inf
+
+from .geodesy import Leg
+
+
+def _orientation(a, b, c):
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def segments_cross(p1, p2, q1, q2):
+    """True if segment p1-p2 crosses segment q1-q2
+    """
+    return ((_orientation(q1, q2, p1) > 0) != (_orientation(q1, q2, p2) > 0) and
+            (_orientation(p1, p2, q1) > 0) != (_orientation(p1, p2, q2) > 0))
+
+
+def point_in_polygon(point, vertices):
+    """Even-odd ray casting test against every edge of the polygon
+    """
+    x, y = point
+    inside = False
+    for (ax, ay), (bx, by) in zip(vertices, vertices[-1:] + vertices[:-1]):
+        if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+            inside = not inside
+    return inside
+
+
+class LegGridIndex:
+    """Uniform grid over mission legs for nearest-leg lookups
+
+    Each leg is bucketed into every cell it may pass through when the index
+    is built. A lookup measures only the legs in rings of cells around the
+    position, stopping as soon as no leg in an unvisited ring could be
+    closer, so the cost depends on the local leg density rather than the
+    mission length.
+    """
+
+    def __init__(self, legs, cell_size=100):
+        self.legs = legs
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        # a leg passing through a cell is at most this far from its center
+        half_diagonal = cell_size * sqrt(2) / 2
+        for i, leg in enumerate(legs):
+            x_min, x_max = sorted((leg.start[0], leg.end[0]))
+            y_min, y_max = sorted((leg.start[1], leg.end[1]))
+            for cx in range(self._cell(x_min), self._cell(x_max) + 1):
+                for cy in range(self._cell(y_min), self._cell(y_max) + 1):
+                    center = ((cx + 0.5) * cell_size, (cy + 0.5) * cell_size)
+                    if leg.distance_to(center) <= half_diagonal:
+                        self.cells[(cx, cy)].append(i)
+
+        if self.cells:
+            xs = [cx for cx, _ in self.cells]
+            ys = [cy for _, cy in self.cells]
+            self.bounds = (min(xs), min(ys), max(xs), max(ys))
+        else:
+            self.bounds = None
+
+    def __len__(self):
+        return len(self.legs)
+
+    def _cell(self, value):
+        return int(floor(value / self.cell_size))
+
+    @staticmethod
+    def _ring(cx, cy, ring):
+        if ring == 0:
+            yield cx, cy
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield x, cy - ring
+            yield x, cy + ring
+        for y in range(cy - ring + 1, cy + ring):
+            yield cx - ring, y
+            yield cx + ring, y
+
+    def nearest(self, position, first=0):
+        """Index of and distance [m] to the leg closest to an (east, north) position
+
+        Legs before `first` are ignored. Returns (None, None) if there are
+        no legs to search.
+        """
+        if self.bounds is None:
+            return None, None
+        cx, cy = self._cell(position[0]), self._cell(position[1])
+        x_min, y_min, x_max, y_max = self.bounds
+        max_ring = max(cx - x_min, x_max - cx, cy - y_min, y_max - cy, 0)
+
+        best, best_distance = None, inf
+        for ring in range(max_ring + 1):
+            for cell in self._ring(cx, cy, ring):
+                for i in self.cells.get(cell, ()):
+                    if i < first:
+                        continue
+                    distance = self.legs[i].distance_to(position)
+                    if distance < best_distance or (distance == best_distance and i < best):
+                        best, best_distance = i, distance
+            # legs only found in further rings are at least this far away
+            if best_distance <= ring * self.cell_size:
+                break
+
+        if best is None:
+            return None, None
+        return best, best_distance
+
+
+class PolygonGridIndex:
+    """Point in polygon tests against a uniform grid over the polygon
+
+    When the index is built every cell records whether its center is inside
+    the polygon and which edges may pass through it. Testing a point in a
+    cell without edges is a lookup. Otherwise the answer for the cell center
+    is flipped for every edge of that cell crossed on the way to the point.
+    """
+
+    def __init__(self, vertices, cell_size=None, cells_per_side=256):
+        xs = [x for x, _ in vertices]
+        ys = [y for _, y in vertices]
+        self.x0, self.y0 = min(xs), min(ys)
+        extent = max(max(xs) - self.x0, max(ys) - self.y0)
+        self.cell_size = cell_size or (extent / cells_per_side) or 1
+        self.nx = int((max(xs) - self.x0) // self.cell_size) + 1
+        self.ny = int((max(ys) - self.y0) // self.cell_size) + 1
+
+        edges = [Leg(a, b) for a, b in zip(vertices, vertices[1:] + vertices[:1]) if a != b]
+        self.edges = defaultdict(list)
+        half_diagonal = self.cell_size * sqrt(2) / 2
+        for edge in edges:
+            x_min, x_max = sorted((edge.start[0], edge.end[0]))
+            y_min, y_max = sorted((edge.start[1], edge.end[1]))
+            for cx in range(self._col(x_min), self._col(x_max) + 1):
+                for cy in range(self._row(y_min), self._row(y_max) + 1):
+                    if edge.distance_to(self._center(cx, cy)) <= half_diagonal:
+                        self.edges[(cx, cy)].append(edge)
+
+        # x coordinates where each row's center line crosses an edge
+        crossings = [[] for _ in range(self.ny)]
+        for edge in edges:
+            (ax, ay), (bx, by) = edge.start, edge.end
+            if ay == by:
+                continue
+            for cy in range(self._row(min(ay, by)), self._row(max(ay, by)) + 1):
+                y = self.y0 + (cy + 0.5) * self.cell_size
+                if (ay > y) != (by > y):
+                    crossings[cy].append(ax + (y - ay) * (bx - ax) / (by - ay))
+
+        self.inside = []
+        for row in crossings:
+            row.sort()
+            self.inside.append(bytearray(
+                bisect_right(row, self.x0 + (cx + 0.5) * self.cell_size) & 1 for cx in range(self.nx)
+            ))
+
+    def _col(self, x):
+        return int(floor((x - self.x0) / self.cell_size))
+
+    def _row(self, y):
+        return int(floor((y - self.y0) / self.cell_size))
+
+    def _center(self, cx, cy):
+        return self.x0 + (cx + 0.5) * self.cell_size, self.y0 + (cy + 0.5) * self.cell_size
+
+    def contains(self, position):
+        """True if the (east, north) position is inside the polygon
+        """
+        cx, cy = self._col(position[0]), self._row(position[1])
+        if not (0 <= cx < self.nx and 0 <= cy < self.ny):
+            return False
+        inside = self.inside[cy][cx]
+        edges = self.edges.get((cx, cy))
+        if edges:
+            center = self._center(cx, cy)
+            for edge in edges:
+                if segments_cross(center, position, edge.start, edge.end):
+                    inside = not inside
+        return bool(inside)
@@ -0,0 +1,158 @@
+"""
+Batched telemetry logging
+
+Components call `writer.log(Model, **fields)` from the event loop, which
+only appends to an in-memory queue. A background thread flushes the queue
+with one `bulk_create` per model every `batch_size` rows or
+`flush_interval` seconds, whichever comes first, so the event loop never
+waits on SQLite.
+
+The queue holds at most `max_rows` rows. When the disk can't keep up the
+oldest rows are dropped and counted rather than letting memory grow.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque, OrderedDict
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def enable_wal():
+    """Switch the sqlite database to write-ahead logging
+
+    Readers no longer block the writer and commits only need to append to the
+    WAL, with synchronous=NORMAL an fsync is only done at checkpoints.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+
+
+def close_connection():
+    # each thread has its own database connection
+    connection.close()
+
+
+def bulk_create(model, rows):
+    with transaction.atomic():
+        model.objects.bulk_create([model(**values) for values in rows])
+
+
+class TelemetryWriter:
+    """Queue telemetry rows and write them in batches from a worker thread
+    """
+
+    def __init__(self, batch_size=200, flush_interval=1, max_rows=5000, write=bulk_create,
+                 setup=enable_wal, teardown=close_connection):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write = write
+        self.setup = setup
+        self.teardown = teardown
+        self.queued = 0
+        self.written = 0
+        # rows dropped because the queue was full
+        self.dropped = 0
+        # rows lost to database errors
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_time = None
+        self._rows = deque(maxlen=max_rows)
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    @property
+    def max_rows(self):
+        return self._rows.maxlen
+
+    def log(self, model, **values):
+        """Queue a row for `model`, never blocks
+        """
+        if len(self._rows) == self.max_rows:
+            # appending to a full deque drops the oldest row
+            self.dropped += 1
+        self._rows.append((model, values))
+        self.queued += 1
+        if len(self._rows) >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything queued so far, grouped into one insert per model
+        """
+        batch = OrderedDict()
+        for _ in range(len(self._rows)):
+            try:
+                model, values = self._rows.popleft()
+            except IndexError:
+                break
+            batch.setdefault(model, []).append(values)
+        if not batch:
+            return 0
+
+        start = time.monotonic()
+        written = 0
+        for model, rows in batch.items():
+            try:
+                self.write(model, rows)
+            except Exception:
+                logger.exception('Failed to write {} {} rows'.format(len(rows), model.__name__))
+                self.failed += len(rows)
+            else:
+                written += len(rows)
+        self.written += written
+        self.flushes += 1
+        self.last_flush_time = time.monotonic() - start
+        return written
+
+    def _run(self):
+        try:
+            if self.setup is not None:
+                self.setup()
+            while self._running:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self.flush()
+            self.flush()
+        finally:
+            if self.teardown is not None:
+                self.teardown()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        """Flush what's left and stop the worker thread
+        """
+        if self._thread is None:
+            return
+        self._running = False
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            'queued': self.queued,
+            'pending': len(self._rows),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'flushes': self.flushes,
+            'last_flush_ms': self.last_flush_time * 1e3 if self.last_flush_time is not None else None,
+        }
+
+
+# one writer per process shared by all components
+writer = TelemetryWriter()
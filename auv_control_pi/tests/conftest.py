@@ -0,0 +1,17 @@
+import os
+
+import django
+import pytest
+
+
+@pytest.fixture(scope='session')
+def db():
+    """Set up django with an empty test database for the tests that need one
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auv_control_pi.settings')
+    django.setup()
+    from django.db import connection
+    # sqlite test databases are in memory
+    old_name = connection.creation.create_test_db(verbosity=0)
+    yield
+    connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+
+from ..archive import ArchiveReader, ArchiveWriter, chunk_path, prune, topics
+
+FIELDS = [('heading', '<f4'), ('seq', '<u4')]
+
+
+@pytest.fixture
+def archive(tmpdir):
+    """10 seconds of 100 Hz samples in chunks of 256 rows"""
+    root = str(tmpdir)
+    writer = ArchiveWriter(root, 'ahrs.update', FIELDS, chunk_rows=256)
+    for i in range(1000):
+        writer.append(100 + i / 100, heading=i % 360, seq=i)
+    writer.close()
+    return root
+
+
+def test_read_time_range(archive):
+    reader = ArchiveReader(archive, 'ahrs.update')
+    assert topics(archive) == ['ahrs.update']
+    assert len(reader) == 1000
+    assert len(reader.index) == 4
+    assert reader.start == 100
+    assert reader.end == pytest.approx(109.99)
+
+    rows = reader.read(102, 105)
+    assert rows['seq'][0] == 200
+    assert rows['seq'][-1] == 500
+    assert np.all(np.diff(rows['t']) > 0)
+
+    # only the requested fields
+    rows = reader.read(100.5, 101, fields=['seq'])
+    assert rows.dtype.names == ('seq',)
+    assert list(rows['seq']) == list(range(50, 101))
+
+    assert len(reader.read()) == 1000
+    assert len(reader.read(200, 300)) == 0
+    assert reader.read(200, 300, fields=['heading']).dtype.names == ('heading',)
+
+
+def test_writer_appends_to_existing_archive(archive):
+    writer = ArchiveWriter(archive, 'ahrs.update', FIELDS, chunk_rows=256)
+    assert writer.chunks == 4
+    writer.append(110, heading=None)
+    writer.flush()
+
+    reader = ArchiveReader(archive, 'ahrs.update')
+    rows = reader.read(110)
+    assert len(rows) == 1
+    assert np.isnan(rows['heading'][0])
+    assert rows['seq'][0] == 0
+
+
+def test_time_going_backwards_starts_a_new_chunk(tmpdir):
+    root = str(tmpdir)
+    writer = ArchiveWriter(root, 'gps.update', FIELDS)
+    for t in (10, 11, 12, 5, 6):
+        writer.append(t, seq=t)
+    writer.close()
+
+    reader = ArchiveReader(root, 'gps.update')
+    assert len(reader.index) == 2
+    assert list(reader.read(5, 11)['seq']) == [10, 11, 5, 6]
+
+
+def test_prune_old_chunks(archive):
+    # a writer that's still running while the archive is pruned
+    writer = ArchiveWriter(archive, 'ahrs.update', FIELDS, chunk_rows=256)
+    path = ArchiveReader(archive, 'ahrs.update').path
+    size = os.path.getsize(chunk_path(path, 0))
+
+    # chunks 0 and 1 end at 102.55 and 105.11
+    assert prune(archive, 105.2) == (2, 2 * size)
+    assert not os.path.exists(chunk_path(path, 0))
+    assert not os.path.exists(chunk_path(path, 1))
+    reader = ArchiveReader(archive, 'ahrs.update')
+    assert list(reader.index['chunk']) == [2, 3]
+    assert reader.start == pytest.approx(105.12)
+    assert list(reader.read(106, 106.02)['seq']) == [600, 601, 602]
+
+    writer.append(110, seq=1000)
+    writer.close()
+    reader = ArchiveReader(archive, 'ahrs.update')
+    assert list(reader.index['chunk']) == [2, 3, 4]
+    assert list(reader.read(110)['seq']) == [1000]
+
+    # the newest chunk is kept so numbering carries on
+    expected = reader.nbytes - os.path.getsize(chunk_path(path, 4))
+    assert prune(archive, 1000) == (2, expected)
+    assert list(ArchiveReader(archive, 'ahrs.update').index['chunk']) == [4]
+    assert ArchiveWriter(archive, 'ahrs.update', FIELDS).chunks == 5
+    assert prune(archive, 1000) == (0, 0)
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ..compaction import bucket_start, rollup, windows
+
+START = datetime(2018, 12, 20, 3, 41, 0, tzinfo=timezone.utc)
+
+
+def test_bucket_start():
+    t = START + timedelta(seconds=75, microseconds=300000)
+    assert bucket_start(t, 1) == START + timedelta(seconds=75)
+    assert bucket_start(t, 60) == START + timedelta(seconds=60)
+
+
+def test_rollup_raw_samples():
+    samples = [(START + timedelta(seconds=i / 10), i, i, i, 1) for i in range(20)]
+    samples.insert(3, (START, None, None, None, 1))
+    buckets = rollup(samples, 1)
+    assert list(buckets) == [START, START + timedelta(seconds=1)]
+    assert buckets[START] == (4.5, 0, 9, 10)
+    assert buckets[START + timedelta(seconds=1)] == (14.5, 10, 19, 10)
+
+
+def test_rolling_up_aggregates_matches_raw_rollup():
+    samples = [(START + timedelta(seconds=i / 7), (i * 37) % 11, (i * 37) % 11, (i * 37) % 11, 1)
+               for i in range(7 * 180)]
+    seconds = rollup(samples, 1)
+    minutes = rollup(((start,) + bucket for start, bucket in seconds.items()), 60)
+    direct = rollup(samples, 60)
+    assert list(minutes) == list(direct)
+    for start in direct:
+        mean, low, high, count = minutes[start]
+        assert mean == pytest.approx(direct[start][0])
+        assert (low, high, count) == direct[start][1:]
+
+
+def test_windows():
+    end = START + timedelta(hours=2, minutes=30)
+    assert list(windows(START, end)) == [
+        (START, START + timedelta(hours=1)),
+        (START + timedelta(hours=1), START + timedelta(hours=2)),
+        (START + timedelta(hours=2), end),
+    ]
+    assert list(windows(end, START)) == []
+
+
+@pytest.fixture
+def compacttelemetry(db):
+    from ..management.commands import compacttelemetry
+    from ..models import AUVLog, TelemetryAggregate
+    AUVLog.objects.all().delete()
+    TelemetryAggregate.objects.all().delete()
+    return compacttelemetry
+
+
+def _aggregates(resolution):
+    from ..models import TelemetryAggregate
+    return list(TelemetryAggregate.objects.filter(field='throttle', resolution=resolution)
+                .order_by('timestamp').values_list('timestamp', 'mean', 'min', 'max', 'count'))
+
+
+def test_late_rows_are_merged_into_compacted_seconds(compacttelemetry):
+    from ..models import AUVLog, TelemetryAggregate
+    for ms, throttle in ((100, 10), (600, 20), (1200, 30)):
+        AUVLog.objects.create(timestamp=START + timedelta(milliseconds=ms), throttle=throttle)
+    cutoff = START + timedelta(minutes=1)
+    assert compacttelemetry.compact_log(AUVLog, ('throttle',), cutoff) == 3
+
+    # arrives after its second was compacted
+    AUVLog.objects.create(timestamp=START + timedelta(milliseconds=900), throttle=60)
+    assert compacttelemetry.compact_log(AUVLog, ('throttle',), cutoff) == 1
+    assert _aggregates(TelemetryAggregate.RESOLUTION_SECOND) == [
+        (START, 30, 10, 60, 3),
+        (START + timedelta(seconds=1), 30, 30, 30, 1),
+    ]
+
+
+def test_late_seconds_are_merged_into_compacted_minutes(compacttelemetry):
+    from ..models import TelemetryAggregate
+
+    def second(offset, mean, low, high, count):
+        TelemetryAggregate.objects.create(
+            source='auvlog', field='throttle', resolution=TelemetryAggregate.RESOLUTION_SECOND,
+            timestamp=START + timedelta(seconds=offset), mean=mean, min=low, max=high, count=count,
+        )
+
+    second(0, 10, 5, 15, 10)
+    second(61, 50, 50, 50, 1)
+    cutoff = START + timedelta(minutes=2)
+    assert compacttelemetry.compact_seconds(cutoff) == 2
+
+    second(30, 40, 0, 100, 30)
+    assert compacttelemetry.compact_seconds(cutoff) == 1
+    assert _aggregates(TelemetryAggregate.RESOLUTION_SECOND) == []
+    assert _aggregates(TelemetryAggregate.RESOLUTION_MINUTE) == [
+        (START, 32.5, 0, 100, 40),
+        (START + timedelta(minutes=1), 50, 50, 50, 1),
+    ]
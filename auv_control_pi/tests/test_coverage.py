@@ -0,0 +1,62 @@
+import pytest
+
+from ..coverage import generate, lawnmower, spiral
+from ..geodesy import LocalFrame
+from ..utils import Point
+
+ORIGIN = Point(49.273008, -123.179694)
+
+
+def _area(frame, enu_vertices):
+    return [tuple(frame.to_point(east, north)) for east, north in enu_vertices]
+
+
+@pytest.fixture
+def frame():
+    return LocalFrame(ORIGIN)
+
+
+def test_lawnmower_square(frame):
+    # 1 km square, lines running north
+    area = _area(frame, [(0, 0), (1000, 0), (1000, 1000), (0, 1000)])
+    waypoints = lawnmower(area, spacing=100, angle=0)
+    assert len(waypoints) == 20
+
+    enu = [frame.to_enu(point) for point in waypoints]
+    # each line starts and ends on the boundary, and they alternate direction
+    assert [round(east) for east, _ in enu[:6]] == [50, 50, 150, 150, 250, 250]
+    assert [round(north) for _, north in enu[:6]] == [0, 1000, 1000, 0, 0, 1000]
+    assert all(-1 < east < 1001 and -1 < north < 1001 for east, north in enu)
+
+
+def test_lawnmower_concave(frame):
+    # U shape open to the north, east-west lines cross both arms near the top
+    area = _area(frame, [(0, 0), (300, 0), (300, 300), (200, 300), (200, 100),
+                         (100, 100), (100, 300), (0, 300)])
+    waypoints = lawnmower(area, spacing=50, angle=90)
+    enu = [frame.to_enu(point) for point in waypoints]
+    assert len(enu) == 2 * (6 + 4)
+    # the left arm is finished before the right one is started
+    right_arm = [east > 150 and north > 100 for east, north in enu]
+    first_right = right_arm.index(True)
+    assert all(right_arm[first_right:])
+
+
+def test_spiral_stays_inside(frame):
+    area = _area(frame, [(-500, -500), (500, -500), (500, 500), (-500, 500)])
+    waypoints = spiral(area, spacing=50)
+    enu = [frame.to_enu(point) for point in waypoints]
+    assert len(enu) > 300
+    assert all(abs(east) < 500.01 and abs(north) < 500.01 for east, north in enu)
+    # from the edge inwards
+    assert abs(enu[0][0]) + abs(enu[0][1]) > abs(enu[-1][0]) + abs(enu[-1][1])
+
+
+def test_generate_validates(frame):
+    area = _area(frame, [(0, 0), (100, 0), (100, 100)])
+    with pytest.raises(ValueError):
+        generate(area[:2], spacing=10)
+    with pytest.raises(ValueError):
+        generate(area, spacing=0)
+    with pytest.raises(ValueError):
+        generate(area, spacing=10, pattern='zigzag')
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+from pygc import great_distance
+
+from ..geodesy import LocalFrame, Leg, plan_legs
+from ..utils import Point, point_at_distance
+
+
+@pytest.fixture
+def frame():
+    return LocalFrame(Point(49.273008, -123.179694))
+
+
+def test_to_enu_round_trip(frame):
+    point = Point(49.28, -123.17)
+    east, north = frame.to_enu(point)
+    assert east > 0 and north > 0
+    assert frame.to_point(east, north) == (pytest.approx(point.lat), pytest.approx(point.lng))
+
+
+def test_bearing_distance_due_north(frame):
+    end = point_at_distance(1000, 0, frame.origin)
+    bearing, distance = frame.bearing_distance(frame.origin, end)
+    assert bearing == pytest.approx(0, abs=1e-6) or bearing == pytest.approx(360)
+    assert distance == pytest.approx(1000, rel=1e-4)
+
+
+@pytest.mark.parametrize('mission_range, distance_error, bearing_error', [
+    (1000, 2e-4, 0.01),
+    (5000, 1e-3, 0.05),
+])
+def test_bearing_distance_matches_pygc(frame, mission_range, distance_error, bearing_error):
+    rng = random.Random(0)
+    for _ in range(100):
+        start = point_at_distance(rng.uniform(0, mission_range), rng.uniform(0, 360), frame.origin)
+        end = point_at_distance(rng.uniform(10, mission_range), rng.uniform(0, 360), start)
+        bearing, distance = frame.bearing_distance(start, end)
+        result = great_distance(start_latitude=start.lat, start_longitude=start.lng,
+                                end_latitude=end.lat, end_longitude=end.lng)
+        assert distance == pytest.approx(float(result['distance']), rel=distance_error)
+        assert abs((bearing - float(result['azimuth']) + 180) % 360 - 180) < bearing_error
+
+
+def test_leg_track_errors():
+    # heading east along the x axis
+    leg = Leg((0, 0), (100, 0))
+    assert leg.bearing == pytest.approx(90)
+    assert leg.length == pytest.approx(100)
+
+    along, cross = leg.track_errors((40, -10))
+    assert along == pytest.approx(40)
+    # south of an eastbound track is to the right
+    assert cross == pytest.approx(10)
+    assert leg.distance_to_end(along, cross) == pytest.approx((60 ** 2 + 10 ** 2) ** 0.5)
+
+
+def test_leg_los_heading():
+    leg = Leg((0, 0), (0, 100))
+    assert leg.los_heading(0, 20) == pytest.approx(0, abs=1e-9)
+    # right of a northbound track steer back left, and vice versa
+    assert leg.los_heading(20, 20) == pytest.approx(315)
+    assert leg.los_heading(-20, 20) == pytest.approx(45)
+
+
+def test_leg_overshoot_reaches_end():
+    leg = Leg((0, 0), (0, 100))
+    radius = 5
+    along, cross = leg.track_errors((5, 95))
+    assert not leg.reached_end(along, cross, radius)
+    # passed the end outside the arrival radius, los keeps steering along the leg
+    for position in ((5, 105), (5, 130)):
+        along, cross = leg.track_errors(position)
+        assert leg.distance_to_end(along, cross) > radius
+        assert leg.los_heading(cross, 20) == pytest.approx(346, abs=0.1)
+        assert leg.reached_end(along, cross, radius)
+    along, cross = leg.track_errors((1, 97))
+    assert leg.reached_end(along, cross, radius)
+
+
+def test_plan_legs(frame):
+    points = [frame.origin,
+              point_at_distance(500, 0, frame.origin),
+              point_at_distance(500, 90, point_at_distance(500, 0, frame.origin))]
+    legs = plan_legs(frame, points)
+    assert len(legs) == 2
+    assert legs[0].bearing == pytest.approx(0, abs=0.01)
+    assert legs[1].bearing == pytest.approx(90, abs=0.01)
+    assert legs[0].end == legs[1].start
+    assert [leg.length for leg in legs] == [pytest.approx(500, rel=1e-3)] * 2
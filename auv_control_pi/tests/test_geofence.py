@@ -0,0 +1,25 @@
+from ..geofence import Fence, breach_stops, breached_fences
+from ..utils import Point
+
+HARBOUR = [(49.27, -123.19), (49.28, -123.19), (49.28, -123.17), (49.27, -123.17)]
+
+
+def test_keep_in_and_keep_out_fences():
+    keep_in = Fence(HARBOUR, name='harbour')
+    keep_out = Fence([(49.274, -123.182), (49.276, -123.182), (49.276, -123.178), (49.274, -123.178)],
+                     keep_in=False, name='dock')
+
+    assert breached_fences([keep_in, keep_out], Point(49.272, -123.18)) == []
+    assert breached_fences([keep_in, keep_out], Point(49.275, -123.18)) == ['dock']
+    assert breached_fences([keep_in, keep_out], Point(49.29, -123.18)) == ['harbour']
+
+
+def test_breach_stops_the_autopilot_until_back_inside():
+    # stop when first breached, whoever is driving
+    assert breach_stops(['harbour'], [], autopilot=False)
+    assert breach_stops(['harbour'], [], autopilot=True)
+    # can still be driven back by hand
+    assert not breach_stops(['harbour'], ['harbour'], autopilot=False)
+    # but the trip can't be resumed while outside
+    assert breach_stops(['harbour'], ['harbour'], autopilot=True)
+    assert not breach_stops([], ['harbour'], autopilot=True)
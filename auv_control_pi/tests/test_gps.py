@@ -0,0 +1,129 @@
+import asyncio
+import struct
+import sys
+import time
+import types
+
+from navio import ublox
+from navio.gps import GPSReader, satellite_summary
+
+
+class FakeGPS:
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    def update(self, timeout=None):
+        if self.messages:
+            return self.messages.pop(0)
+        # behave like a receiver that has gone quiet
+        time.sleep(0.01)
+        return None
+
+
+def test_gps_reader_queues_messages():
+    loop = asyncio.new_event_loop()
+    try:
+        queue = loop.run_until_complete(_make_queue(maxsize=10))
+        reader = GPSReader(FakeGPS(['a', 'b', 'c']), loop, queue, poll_timeout=0.01)
+        reader.start()
+        loop.run_until_complete(asyncio.sleep(0.1))
+        reader.stop(timeout=1)
+        assert not reader.is_alive()
+        assert [queue.get_nowait() for _ in range(queue.qsize())] == ['a', 'b', 'c']
+    finally:
+        loop.close()
+
+
+def test_gps_reader_drops_oldest_when_full():
+    loop = asyncio.new_event_loop()
+    try:
+        queue = loop.run_until_complete(_make_queue(maxsize=2))
+        reader = GPSReader(FakeGPS(['a', 'b', 'c']), loop, queue, poll_timeout=0.01)
+        reader.start()
+        loop.run_until_complete(asyncio.sleep(0.1))
+        reader.stop(timeout=1)
+        assert reader.dropped == 1
+        assert [queue.get_nowait() for _ in range(queue.qsize())] == ['b', 'c']
+    finally:
+        loop.close()
+
+
+async def _make_queue(maxsize):
+    return asyncio.Queue(maxsize=maxsize)
+
+
+class FakeSpiDev:
+
+    def __init__(self):
+        self.stream = bytearray()
+
+    def open(self, bus, cs):
+        pass
+
+    def readbytes(self, n):
+        out = self.stream[:n]
+        del self.stream[:n]
+        return list(out) + [0xff] * (n - len(out))
+
+
+def _frame(msg_class, msg_id, payload):
+    buf = struct.pack('<BBBBH', ublox.PREAMBLE1, ublox.PREAMBLE2, msg_class, msg_id, len(payload)) + payload
+    return buf + struct.pack('<BB', *ublox.UBloxMessage().checksum(data=buf[2:]))
+
+
+def test_spi_chunked_read_skips_filler(monkeypatch):
+    spidev = types.ModuleType('spidev')
+    spidev.SpiDev = FakeSpiDev
+    monkeypatch.setitem(sys.modules, 'spidev', spidev)
+    monkeypatch.setattr(ublox, 'SPI_IDLE_SLEEP', 0)
+
+    ubl = ublox.UBlox('spi:0.0', spi_chunk_size=64)
+    pvt = _frame(ublox.CLASS_NAV, ublox.MSG_NAV_PVT, bytes(92))
+    posecef = _frame(ublox.CLASS_NAV, ublox.MSG_NAV_POSECEF, bytes(20))
+    ubl.dev.stream.extend(pvt + posecef + b'\xff' * 10 + posecef)
+
+    names = [ubl.receive_message().name() for _ in range(3)]
+    assert names == ['NAV_PVT', 'NAV_POSECEF', 'NAV_POSECEF']
+    # the first two messages share transfers, the filler costs one extra probe
+    assert ubl.spi_transactions == 5
+
+    # nothing but filler on the bus
+    assert ubl.receive_message(timeout=0.01) is None
+
+
+def _svinfo(channels):
+    payload = struct.pack('<IBBH', 1000, len(channels), 0, 0)
+    for chn, (flags, cno) in enumerate(channels):
+        payload += struct.pack('<BBBBBbhi', chn, chn + 1, flags, 4, cno, 45, 180, 0)
+    msg = ublox.UBloxMessage()
+    msg.add(_frame(ublox.CLASS_NAV, ublox.MSG_NAV_SVINFO, payload))
+    return msg
+
+
+def test_columnar_unpack_matches_records():
+    msg = _svinfo([(0x01, 40), (0x00, 25), (0x01, 30)])
+    msg.unpack()
+    recs = msg.recs
+
+    msg.unpack(columnar=True)
+    assert msg.iTOW == 1000
+    assert msg.recs == []
+    for field in ('chn', 'svid', 'flags', 'cno', 'elev', 'azim'):
+        assert list(msg.columns[field]) == [r[field] for r in recs]
+
+
+def test_satellite_summary():
+    msg = _svinfo([(0x01, 40), (0x00, 25), (0x01, 30), (0x00, 0)])
+    msg.unpack(columnar=True)
+    assert satellite_summary(msg) == {
+        'channels': 4,
+        'tracked': 3,
+        'used': 2,
+        'cno_mean': 35,
+        'cno_max': 40,
+    }
+
+    msg = _svinfo([])
+    msg.unpack(columnar=True)
+    assert satellite_summary(msg)['used'] == 0
@@ -0,0 +1,90 @@
+import pytest
+
+from ..geodesy import LocalFrame
+from ..utils import Point
+
+
+@pytest.fixture
+def missions(db):
+    from .. import missions
+    return missions
+
+
+def _square(frame, size=1000, points_per_side=4):
+    """Waypoints around a square in `frame`, north-east of its origin
+    """
+    corners = [(0, 0), (size, 0), (size, size), (0, size), (0, 0)]
+    positions = []
+    for (x0, y0), (x1, y1) in zip(corners, corners[1:]):
+        for i in range(points_per_side):
+            f = i / points_per_side
+            positions.append((x0 + (x1 - x0) * f, y0 + (y1 - y0) * f))
+    positions.append(corners[-1])
+    return [frame.to_point(*position)._asdict() for position in positions]
+
+
+def test_upload_in_chunks(missions):
+    from ..models import Mission
+    frame = LocalFrame(Point(lat=49.0, lng=-123.0))
+    waypoints = _square(frame)
+    mission = Mission.objects.create(name='square')
+    assert missions.upload_waypoints(mission.pk, 0, waypoints[:10]) == 10
+    assert missions.upload_waypoints(mission.pk, 10, waypoints[10:]) == len(waypoints)
+    stored = list(mission.waypoints.values_list('index', 'lat', 'lng'))
+    assert stored == [(i, w['lat'], w['lng']) for i, w in enumerate(waypoints)]
+
+
+def test_retried_upload_replaces_the_chunk(missions):
+    from ..models import Mission
+    frame = LocalFrame(Point(lat=49.0, lng=-123.0))
+    waypoints = _square(frame)
+    mission = Mission.objects.create()
+    missions.upload_waypoints(mission.pk, 0, waypoints[:10])
+    # the reply to the second chunk was lost and it's sent again
+    missions.upload_waypoints(mission.pk, 10, waypoints[10:])
+    assert missions.upload_waypoints(mission.pk, 10, waypoints[10:]) == len(waypoints)
+    assert list(mission.waypoints.values_list('index', flat=True)) == list(range(len(waypoints)))
+
+
+def test_resume_after_restart(missions):
+    from ..models import Mission
+    frame = LocalFrame(Point(lat=49.0, lng=-123.0))
+    waypoints = _square(frame)
+    mission = Mission.objects.create()
+    missions.upload_waypoints(mission.pk, 0, waypoints)
+
+    plan = missions.MissionPlan(mission)
+    assert len(plan.points) == len(waypoints)
+    assert len(plan.legs) == len(waypoints) - 1
+    # heading for waypoint 10, on the north side of the square going west
+    missions.save_progress(mission, 10)
+
+    # restart: the mission is loaded again from the database
+    plan = missions.MissionPlan(Mission.objects.get(pk=mission.pk))
+    assert plan.mission.current_waypoint == 10
+    # closest to the first leg, but the mission passes by again on its last
+    # leg and the legs before the saved waypoint are already done
+    waypoint_index, leg = plan.rejoin(frame.to_point(30, 10))
+    assert waypoint_index == 16
+    assert leg is plan.legs[15]
+
+
+def test_rejoin_on_the_current_leg(missions):
+    from ..models import Mission
+    frame = LocalFrame(Point(lat=49.0, lng=-123.0))
+    waypoints = _square(frame)
+    mission = Mission.objects.create()
+    missions.upload_waypoints(mission.pk, 0, waypoints)
+    missions.save_progress(mission, 6)
+
+    plan = missions.MissionPlan(Mission.objects.get(pk=mission.pk))
+    # pushed off the east side between waypoints 5 and 6
+    waypoint_index, leg = plan.rejoin(frame.to_point(1030, 300))
+    assert waypoint_index == 6
+    assert leg is plan.legs[5]
+
+
+def test_mission_without_waypoints(missions):
+    from ..models import Mission
+    with pytest.raises(ValueError):
+        missions.MissionPlan(Mission.objects.create())
@@ -1,4 +1,10 @@
-from ..motors import _calculate_value_in_range
+import asyncio
+
+import pytest
+
+from .. import motors
+from ..motors import Motor, PWMScheduler, ThrustCurve, _calculate_value_in_range
+from ..utils import CommandWatchdog
 
 
 def test_calculate_value_in_range_max():
@@ -55,3 +61,300 @@ def test_calculate_value_in_range_neg_mid():
     assert result == 1475 - (1475 - 1100) // 2
 
 
+class FakePWM:
+
+    def __init__(self):
+        self.writes = []
+
+    def set_duty_cycle(self, period):
+        self.writes.append(period)
+
+
+def _armed_motor(name, scheduler):
+    motor = Motor(name=name, rc_channel=1, scheduler=scheduler, pwm=FakePWM())
+    motor.initialized = True
+    return motor
+
+
+def test_pwm_scheduler_refreshes_and_writes_changes(monkeypatch):
+    monkeypatch.setattr(motors, 'pi', True)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        scheduler = PWMScheduler(refresh_frequency=20)
+        left = _armed_motor('left', scheduler)
+        right = _armed_motor('right', scheduler)
+
+        async def drive():
+            scheduler.start()
+            await asyncio.sleep(0.12)
+            refreshes = scheduler.refreshes
+            left.speed = 50
+            # written on the next loop iteration, not at the next heartbeat
+            await asyncio.sleep(0.005)
+            assert scheduler.refreshes == refreshes
+            assert left.pwm.writes[-1] == left.duty_cycle_ms
+            assert right.pwm.writes[-1] == 1.5
+            scheduler.stop()
+            await scheduler.join()
+
+        loop.run_until_complete(drive())
+        # about 20 Hz worth of heartbeats plus the stop
+        assert 2 <= scheduler.refreshes <= 4
+        assert left.speed == 0
+        assert left.pwm.writes[-1] == 1.5
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def test_pwm_scheduler_write_through_and_batch(monkeypatch):
+    monkeypatch.setattr(motors, 'pi', True)
+    scheduler = PWMScheduler(write_through=True)
+    left = _armed_motor('left', scheduler)
+    right = _armed_motor('right', scheduler)
+
+    left.speed = 50
+    assert left.pwm.writes == [left.duty_cycle_ms]
+    assert scheduler.commits == 1
+
+    with scheduler.batch():
+        left.speed = 20
+        right.speed = -20
+        assert len(left.pwm.writes) == 1
+        assert right.pwm.writes == []
+    assert left.pwm.writes[-1] == left.duty_cycle_ms
+    assert right.pwm.writes == [right.duty_cycle_ms]
+    assert scheduler.commits == 2
+
+    # setting the same speed again doesn't touch the channel
+    left.speed = 20
+    assert len(left.pwm.writes) == 2
+
+
+def test_thrust_curve_from_pwm_map_matches_linear_map():
+    curve = ThrustCurve.from_pwm_map(motors.T100_PWM_MAP)
+    assert curve.pulse_width(0) == 1500
+    assert curve.pulse_width(1) == 1528
+    assert curve.pulse_width(100) == motors.T100_PWM_MAP['max_forward']
+    assert curve.pulse_width(-100) == motors.T100_PWM_MAP['max_reverse']
+    # halfway between the whole percent entries
+    assert curve.pulse_width(50.5) == (curve.pulse_width(50) + curve.pulse_width(51)) / 2
+
+
+def test_thrust_curve_from_calibration():
+    table = [(-100, 1100), (-10, 1460), (0, 1500), (10, 1540), (50, 1650), (100, 1950)]
+    curve = ThrustCurve.from_calibration(table, motors.SERVO_PWM_MAP)
+    assert curve.pulse_width(0) == 1500
+    assert curve.pulse_width(10) == 1540
+    assert curve.pulse_width(30) == 1595
+    assert curve.pulse_width(-55) == 1280
+    assert curve.pulse_width(100) == 1950
+
+    # pulse widths are kept within the pwm map
+    curve = ThrustCurve.from_calibration(table, motors.T100_PWM_MAP)
+    assert curve.pulse_width(100) == motors.T100_PWM_MAP['max_forward']
+
+    with pytest.raises(ValueError):
+        ThrustCurve.from_calibration([(0, 1500)], motors.T100_PWM_MAP)
+
+
+def test_motor_thrust_calibration():
+    motor = Motor(name='left', rc_channel=1, pwm=FakePWM())
+    motor.speed = 10
+    assert motor.duty_cycle_ms == 1.558
+    motor.set_thrust_calibration([(0, 1500), (10, 1600), (100, 1800)])
+    assert motor.duty_cycle_ms == 1.6
+    motor.set_thrust_calibration(None)
+    assert motor.duty_cycle_ms == 1.558
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_pwm_scheduler_slew_limits_output(monkeypatch):
+    monkeypatch.setattr(motors, 'pi', True)
+    clock = FakeClock()
+    scheduler = PWMScheduler(write_through=True, clock=clock)
+    left = _armed_motor('left', scheduler)
+    right = _armed_motor('right', scheduler)
+    left.slew_rate = 100
+
+    with scheduler.batch():
+        left.speed = 50
+        right.speed = 50
+    # the unlimited motor is written straight away, the limited one ramps
+    assert right.output_speed == 50
+    assert left.speed == 50 and left.output_speed == 0
+    assert scheduler.ramping
+
+    # a ramp from rest takes one step at the pwm frequency straight away
+    assert scheduler.step()
+    assert left.output_speed == pytest.approx(100 / motors.PWM_FREQUENCY)
+    for _ in range(30):
+        clock.now += 1 / motors.PWM_FREQUENCY
+        ramping = scheduler.step()
+    assert not ramping
+    assert left.output_speed == 50
+    assert left.pwm.writes[-1] == left.duty_cycle_ms == right.duty_cycle_ms
+
+    # reversing takes a second at 100 %/s
+    left.reverse(50)
+    scheduler.step()
+    clock.now += 0.5
+    scheduler.step()
+    assert left.output_speed == pytest.approx(-2)
+    clock.now += 0.5
+    assert not scheduler.step()
+    assert left.output_speed == -50
+
+    # shutting down doesn't wait for the ramp
+    left.speed = 100
+    scheduler.stop()
+    assert left.output_speed == 0
+    assert left.pwm.writes[-1] == 1.5
+
+
+class _Stopped(Exception):
+    pass
+
+
+def _run_watchdog(watchdog, scheduler, clock, on_expired, until, source_dies_at):
+    """Run `CommandWatchdog.run` on the fake clock until `until()` is true
+
+    A command source sends a keepalive every pwm period until it dies, and
+    ramping motors are stepped at the pwm rate like the scheduler task does.
+    """
+    async def sleep(seconds):
+        end = clock.now + seconds
+        while clock.now < end:
+            clock.now += min(scheduler.ramp_period, end - clock.now)
+            if clock.now < source_dies_at:
+                watchdog.feed()
+            if scheduler.ramping:
+                scheduler.step()
+        if until():
+            raise _Stopped
+
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(_Stopped):
+            loop.run_until_complete(watchdog.run(on_expired, sleep=sleep))
+    finally:
+        loop.close()
+
+
+def _cruising_motor(clock, scheduler, speed=80):
+    motor = _armed_motor('left', scheduler)
+    motor.slew_rate = 200
+    motor.speed = speed
+    while scheduler.step():
+        clock.now += scheduler.ramp_period
+    return motor
+
+
+def test_watchdog_failsafe_ramps_motors_to_stop(monkeypatch):
+    monkeypatch.setattr(motors, 'pi', True)
+    clock = FakeClock()
+    scheduler = PWMScheduler(write_through=True, clock=clock)
+    motor = _cruising_motor(clock, scheduler)
+    watchdog = CommandWatchdog(timeout=0.25, clock=clock)
+    watchdog.feed()
+    tripped_at = []
+
+    def stop():
+        tripped_at.append(clock.now)
+        with scheduler.batch():
+            motor.stop()
+
+    _run_watchdog(watchdog, scheduler, clock, stop,
+                  until=lambda: tripped_at and not motor.ramping, source_dies_at=clock.now)
+
+    assert watchdog.reaction_time < watchdog.check_period
+    # 80 % at 200 %/s takes 0.4 s to ramp down once tripped
+    assert clock.now - tripped_at[0] == pytest.approx(0.4, abs=watchdog.check_period)
+    assert motor.output_speed == 0
+    assert motor.pwm.writes[-1] == 1.5
+
+
+def test_watchdog_stops_motors_when_command_source_dies(monkeypatch):
+    monkeypatch.setattr(motors, 'pi', True)
+    clock = FakeClock()
+    scheduler = PWMScheduler(write_through=True, clock=clock)
+    motor = _cruising_motor(clock, scheduler)
+    watchdog = CommandWatchdog(timeout=0.25, clock=clock)
+    dies_at = clock.now + 2
+    tripped_at = []
+
+    def stop():
+        tripped_at.append(clock.now)
+        motor.stop()
+
+    _run_watchdog(watchdog, scheduler, clock, stop,
+                  until=lambda: clock.now > dies_at + 1, source_dies_at=dies_at)
+
+    # nothing happens while the source is alive, then one trip a timeout after it died
+    assert watchdog.trips == 1
+    assert tripped_at[0] - dies_at == pytest.approx(watchdog.timeout, abs=watchdog.check_period)
+    assert motor.speed == motor.output_speed == 0
+
+
+class FakeArmingPWM(FakePWM):
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def initialize(self):
+        self.calls.append('initialize')
+
+    def set_period(self, freq):
+        self.calls.append('set_period')
+
+    def enable(self):
+        self.calls.append('enable')
+
+
+def test_pwm_scheduler_arms_concurrently_and_applies_queued_speeds(monkeypatch):
+    monkeypatch.setattr(motors, 'pi', True)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        scheduler = PWMScheduler(write_through=True)
+        left = Motor(name='left', rc_channel=1, scheduler=scheduler, pwm=FakeArmingPWM())
+        right = Motor(name='right', rc_channel=2, scheduler=scheduler, pwm=FakeArmingPWM(), slew_rate=1000)
+
+        async def boot():
+            scheduler.start()
+            arming = asyncio.ensure_future(scheduler.arm(arming_time=0.1))
+            await asyncio.sleep(0.02)
+            assert not scheduler.armed
+            # commands while arming are held until the ESC's are armed
+            left.speed = 50
+            right.speed = -50
+            await asyncio.sleep(0)
+            assert left.pwm.writes == [1.5]
+            assert right.pwm.writes == [1.5]
+            assert right.output_speed == 0
+            await arming
+            assert left.pwm.writes[-1] == left.duty_cycle_ms
+            # slew limited motors start ramping from stop once armed
+            await asyncio.sleep(0.1)
+            assert right.output_speed == -50
+            scheduler.stop()
+            await scheduler.join()
+
+        loop.run_until_complete(boot())
+        assert left.pwm.calls == ['initialize', 'set_period', 'enable']
+        assert left.initialized and right.initialized
+        # both channels are held at stop together, not one after the other
+        assert scheduler.arming_time == pytest.approx(0.1, abs=0.05)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
@@ -0,0 +1,73 @@
+import math
+import random
+
+from ..geodesy import Leg
+from ..spatial import LegGridIndex, PolygonGridIndex, point_in_polygon
+
+
+def _random_track(rng, n):
+    position = (0.0, 0.0)
+    legs = []
+    for _ in range(n):
+        end = (position[0] + rng.uniform(-300, 300), position[1] + rng.uniform(-300, 300))
+        legs.append(Leg(position, end))
+        position = end
+    return legs
+
+
+def test_nearest_leg_matches_brute_force():
+    rng = random.Random(0)
+    legs = _random_track(rng, 500)
+    index = LegGridIndex(legs, cell_size=50)
+    for _ in range(200):
+        position = (rng.uniform(-3000, 3000), rng.uniform(-3000, 3000))
+        first = rng.choice([0, 0, 250])
+        distances = [leg.distance_to(position) for leg in legs[first:]]
+        expected = min(distances)
+        i, distance = index.nearest(position, first=first)
+        assert i >= first
+        assert distance == expected
+        assert legs[i].distance_to(position) == expected
+
+
+def test_nearest_leg_on_the_track():
+    legs = [Leg((0, 0), (1000, 0)), Leg((1000, 0), (1000, 1000)), Leg((1000, 1000), (0, 1000))]
+    index = LegGridIndex(legs)
+    assert index.nearest((500, 10)) == (0, 10)
+    assert index.nearest((990, 600)) == (1, 10)
+    # far outside the indexed area
+    assert index.nearest((500, 5000)) == (2, 4000)
+    assert index.nearest((500, 10), first=2) == (2, 990)
+
+
+def test_empty_index():
+    assert LegGridIndex([]).nearest((0, 0)) == (None, None)
+
+
+def _coastline(rng, n, radius=1000):
+    vertices = []
+    for i in range(n):
+        angle = 2 * math.pi * i / n
+        r = radius + 0.3 * radius * math.sin(7 * angle) + rng.uniform(-0.08, 0.08) * radius
+        vertices.append((r * math.cos(angle), r * math.sin(angle)))
+    return vertices
+
+
+def test_polygon_index_matches_ray_casting():
+    rng = random.Random(0)
+    vertices = _coastline(rng, 2000)
+    index = PolygonGridIndex(vertices)
+    for _ in range(5000):
+        position = (rng.uniform(-1500, 1500), rng.uniform(-1500, 1500))
+        assert index.contains(position) == point_in_polygon(position, vertices)
+
+
+def test_polygon_index_concave():
+    # U shape open to the north
+    vertices = [(0, 0), (300, 0), (300, 300), (200, 300), (200, 100), (100, 100), (100, 300), (0, 300)]
+    index = PolygonGridIndex(vertices, cell_size=40)
+    assert index.contains((50, 250))
+    assert index.contains((150, 50))
+    assert not index.contains((150, 250))
+    assert not index.contains((-10, 50))
+    assert not index.contains((1000, 1000))
@@ -0,0 +1,76 @@
+import threading
+
+from ..telemetry import TelemetryWriter
+
+
+class Row:
+    pass
+
+
+class OtherRow:
+    pass
+
+
+class FakeDatabase:
+
+    def __init__(self):
+        self.inserts = []
+        self.fail = False
+
+    def write(self, model, rows):
+        if self.fail:
+            raise IOError('disk full')
+        self.inserts.append((model, rows))
+
+
+def test_flush_writes_one_batch_per_model():
+    db = FakeDatabase()
+    writer = TelemetryWriter(write=db.write, setup=None, teardown=None)
+    for i in range(3):
+        writer.log(Row, value=i)
+        writer.log(OtherRow, value=-i)
+
+    assert writer.flush() == 6
+    assert db.inserts == [
+        (Row, [{'value': 0}, {'value': 1}, {'value': 2}]),
+        (OtherRow, [{'value': 0}, {'value': -1}, {'value': -2}]),
+    ]
+    assert writer.flush() == 0
+    assert writer.stats()['written'] == 6
+
+
+def test_queue_is_bounded_and_counts_drops():
+    db = FakeDatabase()
+    writer = TelemetryWriter(max_rows=3, write=db.write, setup=None, teardown=None)
+    for i in range(5):
+        writer.log(Row, value=i)
+    assert writer.dropped == 2
+    writer.flush()
+    # the newest rows are kept
+    assert db.inserts == [(Row, [{'value': 2}, {'value': 3}, {'value': 4}])]
+
+    db.fail = True
+    writer.log(Row, value=5)
+    assert writer.flush() == 0
+    assert writer.failed == 1
+
+
+def test_worker_flushes_full_batches_and_on_stop():
+    db = FakeDatabase()
+    writer = TelemetryWriter(batch_size=10, flush_interval=60, write=db.write, setup=None, teardown=None)
+    writer.start()
+    try:
+        # a full batch wakes the worker long before the flush interval
+        for i in range(10):
+            writer.log(Row, value=i)
+        for _ in range(100):
+            if db.inserts:
+                break
+            threading.Event().wait(0.01)
+        assert len(db.inserts[0][1]) == 10
+
+        writer.log(Row, value=10)
+    finally:
+        writer.stop()
+    assert db.inserts[-1] == (Row, [{'value': 10}])
+    assert writer.stats()['pending'] == 0
@@ -0,0 +1,152 @@
+import struct
+
+import pytest
+
+from navio import ublox
+from navio.ublox_log import INDEX_RECORD, UBloxRecorder, UBloxReplay
+
+
+class FakeClock:
+
+    def __init__(self, now=100.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _message(msg_class, msg_id, payload):
+    msg = ublox.UBloxMessage()
+    buf = struct.pack('<BBBBH', ublox.PREAMBLE1, ublox.PREAMBLE2, msg_class, msg_id, len(payload)) + payload
+    msg.add(buf + struct.pack('<BB', *msg.checksum(data=buf[2:])))
+    return msg
+
+
+@pytest.fixture
+def logfile(tmpdir):
+    """A 10 second log with one PVT + one SVINFO per second"""
+    path = str(tmpdir.join('gps.ubx'))
+    clock = FakeClock()
+    recorder = UBloxRecorder(path, clock=clock)
+    for second in range(10):
+        itow = 1000 * second
+        recorder.write(_message(ublox.CLASS_NAV, ublox.MSG_NAV_PVT, struct.pack('<I', itow) + bytes(88)))
+        clock.now += 0.1
+        recorder.write(_message(ublox.CLASS_NAV, ublox.MSG_NAV_SVINFO, struct.pack('<IBBH', itow, 0, 0, 0)))
+        clock.now += 0.9
+    recorder.close()
+    return path
+
+
+def test_replay_returns_recorded_messages(logfile):
+    replay = UBloxReplay(logfile, speed=None)
+    assert len(replay) == 20
+    assert replay.duration == pytest.approx(9.1)
+
+    names = []
+    msg = replay.receive_message()
+    while msg is not None:
+        names.append(msg.name())
+        msg = replay.receive_message()
+    assert names == ['NAV_PVT', 'NAV_SVINFO'] * 10
+    replay.close()
+
+
+def test_replay_seek(logfile):
+    replay = UBloxReplay(logfile, speed=None)
+    replay.seek_time(5)
+    msg = replay.receive_message()
+    msg.unpack()
+    assert msg.iTOW == 5000
+
+    replay.seek_itow(7000)
+    msg = replay.receive_message()
+    msg.unpack()
+    assert msg.iTOW == 7000
+    assert replay.tell() == pytest.approx(7.1)
+    replay.close()
+
+
+def test_replay_speed(logfile):
+    clock = FakeClock()
+    replay = UBloxReplay(logfile, speed=2, clock=clock, sleep=clock.sleep)
+    replay.seek_time(3)
+    for _ in range(4):
+        replay.receive_message()
+    # 1.1 seconds of log replayed at twice real time
+    assert clock.now - 100.0 == pytest.approx(0.55)
+
+    # a message that isn't due within the timeout is not returned
+    assert replay.receive_message(timeout=0.1) is None
+    msg = replay.receive_message(timeout=1)
+    msg.unpack()
+    assert msg.iTOW == 5000
+    assert clock.now - 100.0 == pytest.approx(1.0)
+    replay.close()
+
+
+def test_recorder_flushes_on_a_timer(tmpdir):
+    path = str(tmpdir.join('gps.ubx'))
+    clock = FakeClock()
+    recorder = UBloxRecorder(path, flush_interval=1, clock=clock)
+
+    def on_disk():
+        with open(path, 'rb') as f:
+            size = len(f.read())
+        with open(path + '.idx', 'rb') as f:
+            records = list(INDEX_RECORD.iter_unpack(f.read()))
+        return size, records
+
+    msg = _message(ublox.CLASS_NAV, ublox.MSG_NAV_PVT, struct.pack('<I', 0) + bytes(88))
+    for _ in range(5):
+        recorder.write(msg)
+        clock.now += 0.1
+    # still buffered
+    assert on_disk() == (0, [])
+
+    clock.now += 0.6
+    recorder.write(msg)
+    size, records = on_disk()
+    assert size == 6 * len(msg._buf)
+    assert len(records) == 6
+
+    # records only ever point at frames that are on disk
+    for _ in range(3):
+        recorder.write(msg)
+        clock.now += 0.4
+        size, records = on_disk()
+        assert all(offset + len(msg._buf) <= size for _, _, offset in records)
+    recorder.close()
+    size, records = on_disk()
+    assert size == 9 * len(msg._buf)
+    assert len(records) == 9
+
+
+def test_replay_log_cut_short_while_recording(tmpdir):
+    path = str(tmpdir.join('gps.ubx'))
+    clock = FakeClock()
+    recorder = UBloxRecorder(path, flush_interval=60, clock=clock)
+    msg = _message(ublox.CLASS_NAV, ublox.MSG_NAV_PVT, struct.pack('<I', 0) + bytes(88))
+    for _ in range(6):
+        recorder.write(msg)
+    recorder.flush()
+    # frames that spilled to disk before their index records were written
+    for _ in range(100):
+        recorder.write(msg)
+    recorder.log.flush()
+
+    replay = UBloxReplay(path, speed=None)
+    assert len(replay) == 6
+    valid = []
+    msg = replay.receive_message()
+    while msg is not None:
+        valid.append(msg.valid())
+        msg = replay.receive_message()
+    assert valid == [True] * 6
+    replay.close()
+    recorder.close()
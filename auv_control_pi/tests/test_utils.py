@@ -1,4 +1,6 @@
-from ..utils import get_error_angle, Point, heading_to_point, distance_to_point
+import pytest
+
+from ..utils import get_error_angle, Point, heading_to_point, distance_to_point, GeodesicCache, RateLimiter, LatencyStats, CommandWatchdog, ChangePublisher
 
 
 def test_point():
@@ -43,3 +45,103 @@ def test_get_error_angle():
     result = get_error_angle(target=0, heading=179)
     assert result == 179
 
+
+def test_geodesic_cache():
+    calls = []
+
+    def compute(point_a, point_b):
+        calls.append((point_a, point_b))
+        return point_b.lat - point_a.lat
+
+    cache = GeodesicCache(compute, maxsize=2)
+    a, b, c = Point(49, -120), Point(50, -120), Point(51, -120)
+    assert cache(a, b) == 1
+    # equal points are the same key
+    assert cache(Point(49, -120), Point(50, -120)) == 1
+    assert len(calls) == 1
+    assert cache.hit_rate == 0.5
+
+    cache(a, c)
+    cache(a, b)
+    # (a, c) is now least recently used and gets evicted
+    cache(b, c)
+    assert cache.stats()['size'] == 2
+    cache(a, c)
+    assert len(calls) == 4
+    assert cache.stats() == {'hits': 2, 'misses': 4, 'size': 2, 'hit_rate': 2 / 6}
+
+    cache.clear()
+    assert cache.stats()['size'] == 0
+
+
+def test_rate_limiter():
+    now = [0.0]
+    limiter = RateLimiter(max_frequency=20, clock=lambda: now[0])
+    assert limiter.ready()
+    now[0] = 0.04
+    assert not limiter.ready()
+    now[0] = 0.05
+    assert limiter.ready()
+    assert limiter.skipped == 1
+
+    limiter.max_frequency = 0
+    assert limiter.ready()
+    assert limiter.ready()
+
+
+def test_latency_stats():
+    latency = LatencyStats(size=2)
+    assert latency.stats()['count'] == 0
+    for seconds in (0.010, 0.002, 0.004):
+        latency.add(seconds)
+    stats = latency.stats()
+    assert stats['count'] == 2
+    assert stats['mean_ms'] == pytest.approx(3)
+    assert stats['max_ms'] == pytest.approx(4)
+
+
+def test_command_watchdog():
+    now = [0.0]
+    watchdog = CommandWatchdog(timeout=0.5, clock=lambda: now[0])
+    # not armed until the first command
+    now[0] = 10
+    assert not watchdog.check()
+
+    watchdog.feed()
+    now[0] = 10.4
+    assert not watchdog.check()
+    watchdog.feed()
+    now[0] = 10.85
+    assert not watchdog.check()
+    now[0] = 10.95
+    assert watchdog.check()
+    assert watchdog.reaction_time == pytest.approx(0.05)
+    # only reported once
+    assert not watchdog.check()
+    assert watchdog.trips == 1
+
+    watchdog.feed()
+    assert not watchdog.tripped
+    watchdog.timeout = 0
+    now[0] = 100
+    assert not watchdog.check()
+
+
+def test_change_publisher():
+    now = [0.0]
+    publisher = ChangePublisher(keyframe_interval=1, max_frequency=10, clock=lambda: now[0])
+    assert publisher.poll({'speed': 0}) == {'speed': 0, 'seq': 1, 'keyframe': False}
+    # nothing new until the keyframe is due
+    now[0] = 0.5
+    assert publisher.poll({'speed': 0}) is None
+    # changes go out straight away...
+    now[0] = 0.6
+    assert publisher.poll({'speed': 10})['seq'] == 2
+    # ...but no faster than max_frequency, the latest state is sent once allowed
+    now[0] = 0.65
+    assert publisher.poll({'speed': 20}) is None
+    now[0] = 0.75
+    assert publisher.poll({'speed': 30}) == {'speed': 30, 'seq': 3, 'keyframe': False}
+    now[0] = 1.75
+    assert publisher.poll({'speed': 30}) == {'speed': 30, 'seq': 4, 'keyframe': True}
+    assert publisher.keyframes == 1
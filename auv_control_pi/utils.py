@@ -1,5 +1,6 @@
+import asyncio
 import time
-from collections import deque, namedtuple
+from collections import deque, namedtuple, OrderedDict
 from pygc import great_distance, great_circle
 
 Point = namedtuple('Point', ['lat', 'lng'])
@@ -31,24 +32,204 @@ def point_at_distance(distance, heading, current_point):
     return Point(result['latitude'], result['longitude'])
 
 
-def heading_to_point(point_a, point_b):
-    """Calculate heading between two points
+class RateLimiter:
+    """Let an action through at most `max_frequency` times per second
+
+    A `max_frequency` of 0 or None doesn't limit anything.
+    """
+
+    def __init__(self, max_frequency, clock=time.monotonic):
+        self.max_frequency = max_frequency
+        self.clock = clock
+        self.skipped = 0
+        self._last = None
+
+    def ready(self):
+        """Return True (and start a new period) if the action may run now
+        """
+        now = self.clock()
+        if self._last is not None and self.max_frequency and now - self._last < 1 / self.max_frequency:
+            self.skipped += 1
+            return False
+        self._last = now
+        return True
+
+
+class ChangePublisher:
+    """Decide when a state snapshot needs publishing
+
+    A snapshot that differs from the last one published goes out straight
+    away (at most `max_frequency` times per second), an unchanged one is
+    repeated every `keyframe_interval` seconds so new subscribers catch up.
+    Published payloads carry an increasing `seq` so subscribers can detect
+    gaps, and `keyframe` is True for the repeats.
+    """
+
+    def __init__(self, keyframe_interval=1, max_frequency=None, clock=time.monotonic):
+        self.keyframe_interval = keyframe_interval
+        self.max_frequency = max_frequency
+        self.clock = clock
+        self.seq = 0
+        self.keyframes = 0
+        self._state = None
+        self._last = None
+
+    def poll(self, state):
+        """Return the payload to publish for `state`, or None if nothing needs sending
+        """
+        now = self.clock()
+        elapsed = now - self._last if self._last is not None else None
+        changed = state != self._state
+        if elapsed is not None:
+            if changed:
+                if self.max_frequency and elapsed < 1 / self.max_frequency:
+                    return None
+            elif elapsed < self.keyframe_interval:
+                return None
+            else:
+                self.keyframes += 1
+        self._state = state
+        self._last = now
+        self.seq += 1
+        return dict(state, seq=self.seq, keyframe=not changed)
+
+
+class CommandWatchdog:
+    """Expires when it hasn't been fed for `timeout` seconds
+
+    The watchdog only starts timing once it has been fed for the first time,
+    and `check` reports each expiry once.
+    """
+
+    def __init__(self, timeout, clock=time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        self.last_fed = None
+        self.tripped = False
+        self.trips = 0
+        # how long after the deadline the last expiry was noticed [s]
+        self.reaction_time = None
+
+    def feed(self):
+        self.last_fed = self.clock()
+        self.tripped = False
+
+    def check(self):
+        """Return True if the watchdog has just expired
+        """
+        if self.tripped or self.last_fed is None or not self.timeout:
+            return False
+        late = self.clock() - (self.last_fed + self.timeout)
+        if late < 0:
+            return False
+        self.tripped = True
+        self.trips += 1
+        self.reaction_time = late
+        return True
+
+    @property
+    def check_period(self):
+        """Check often enough to react within a fraction of the timeout
+        """
+        return min(max(self.timeout / 10, 0.01), 0.1)
+
+    async def run(self, on_expired, sleep=asyncio.sleep):
+        """Call `on_expired` every time the watchdog expires
+        """
+        while True:
+            if self.check():
+                on_expired()
+            await sleep(self.check_period)
+
+
+class LatencyStats:
+    """Rolling window of latency samples in seconds
+    """
+
+    def __init__(self, size=100):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def stats(self):
+        if not self.samples:
+            return {'count': 0, 'mean_ms': None, 'max_ms': None}
+        return {
+            'count': len(self.samples),
+            'mean_ms': sum(self.samples) / len(self.samples) * 1e3,
+            'max_ms': max(self.samples) * 1e3,
+        }
+
+
+class GeodesicCache:
+    """Bounded LRU cache of `compute(point_a, point_b)` results keyed on the pair of points
+
+    Positions only change at the GPS solution rate so most lookups made
+    by the control loops are repeats of the last one.
     """
+
+    def __init__(self, compute, maxsize=128):
+        self.compute = compute
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def __call__(self, point_a, point_b):
+        key = (point_a, point_b)
+        try:
+            result = self._cache[key]
+        except KeyError:
+            self.misses += 1
+            result = self._cache[key] = self.compute(point_a, point_b)
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        return result
+
+    def clear(self):
+        self._cache.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._cache),
+            'hit_rate': self.hit_rate,
+        }
+
+
+def _great_distance(point_a, point_b):
     result = great_distance(start_latitude=point_a.lat,
                             start_longitude=point_a.lng,
                             end_latitude=point_b.lat,
                             end_longitude=point_b.lng)
-    return int(result['azimuth'])
+    return float(result['azimuth']), float(result['distance'])
+
+
+# shared by heading_to_point and distance_to_point so asking for both
+# between the same points only solves the geodesic once
+geodesic_cache = GeodesicCache(_great_distance)
+
+
+def heading_to_point(point_a, point_b):
+    """Calculate heading between two points
+    """
+    return int(geodesic_cache(point_a, point_b)[0])
 
 
 def distance_to_point(point_a, point_b):
     """Calculate distance between to points
     """
-    result = great_distance(start_latitude=point_a.lat,
-                            start_longitude=point_a.lng,
-                            end_latitude=point_b.lat,
-                            end_longitude=point_b.lng)
-    return int(result['distance'])
+    return int(geodesic_cache(point_a, point_b)[1])
 
 
 def get_error_angle(target, heading):
@@ -4,8 +4,14 @@ from functools import wraps
 
 from autobahn.asyncio import ApplicationSession as AutobahnApplicationSession
 
+from .config import CONFIG_CHANGED_TOPIC, apply_config_changes
+
 logger = logging.getLogger('wamp')
 
+# RPCs registered by sessions running in this process, calling one of
+# these skips the round trip through the router (see ApplicationSession.call)
+local_rpcs = {}
+
 
 def subscribe(topic):
     if topic is None:
@@ -60,6 +66,37 @@ class ApplicationSession(AutobahnApplicationSession):
         handlers = [method for method in methods if getattr(method, 'is_subcription', False)]
         return {method.topic: method for method in handlers}
 
+    @subscribe(CONFIG_CHANGED_TOPIC)
+    def _config_changed(self, changes):
+        apply_config_changes(changes)
+        self.on_config_changed(changes)
+
+    def on_config_changed(self, changes):
+        """Override to update any state derived from config values changed by another component
+        """
+        pass
+
+    def call(self, procedure, *args, **kwargs):
+        """Call an RPC, directly if a session in this process provides it
+
+        Returns a future either way. Remote clients still reach the same
+        methods through the router.
+        """
+        method = local_rpcs.get(procedure)
+        if method is None:
+            return super().call(procedure, *args, **kwargs)
+
+        future = asyncio.Future()
+        try:
+            result = method(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        if asyncio.iscoroutine(result):
+            return asyncio.ensure_future(result)
+        future.set_result(result)
+        return future
+
     def onConnect(self):
         logger.info('Connecting to {} as {}'.format(self.config.realm, self.name))
         self.join(realm=self.config.realm)
@@ -69,6 +106,7 @@ class ApplicationSession(AutobahnApplicationSession):
         for rpc_uri, method in self.rpc_methods(self).items():
             logger.debug('Registering RPC: {}'.format(rpc_uri))
             await self.register(method, rpc_uri)
+            local_rpcs[rpc_uri] = method
 
         for topic, handler in self.subcribtion_handlers(self).items():
             logger.debug('Subscribing To Topic: {}'.format(topic))
@@ -77,3 +115,8 @@ class ApplicationSession(AutobahnApplicationSession):
         loop = asyncio.get_event_loop()
         loop.create_task(self.update())
 
+    def onLeave(self, details):
+        for rpc_uri, method in list(local_rpcs.items()):
+            if getattr(method, '__self__', None) is self:
+                del local_rpcs[rpc_uri]
+        super().onLeave(details)
@@ -0,0 +1,75 @@
+"""
+Write and read back a 10 hour, 100 Hz AHRS mission (3.6M samples) through
+the numpy chunk archive and compare it with AUVLog style rows in SQLite:
+
+    python benchmarks/bench_archive.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auv_control_pi.archive import ArchiveReader, ArchiveWriter  # noqa: E402
+
+HOURS = 10
+RATE = 100  # Hz
+SQLITE_ROWS = 200000
+FIELDS = [('heading', '<f4'), ('roll', '<f4'), ('pitch', '<f4')]
+
+
+def bench_archive(root):
+    n = HOURS * 3600 * RATE
+    writer = ArchiveWriter(root, 'ahrs.update', FIELDS)
+    start = time.perf_counter()
+    for i in range(n):
+        writer.append(i / RATE, heading=i % 360, roll=0.5, pitch=-0.5)
+    writer.close()
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reader = ArchiveReader(root, 'ahrs.update')
+    hour = reader.read(5 * 3600, 6 * 3600, fields=['heading'])
+    mean = float(np.mean(hour['heading']))
+    slice_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    full = reader.read()
+    full_mean = float(np.mean(full['heading']))
+    full_time = time.perf_counter() - start
+    assert len(full) == n and mean >= 0 and full_mean >= 0
+
+    print('archive: {:,} rows, {:.1f} MB on disk ({:.0f} bytes/row)'.format(
+        n, reader.nbytes / 1e6, reader.nbytes / n))
+    print('  append {:.1f} us/row, 1 hour slice + mean {:.0f} ms, full read + mean {:.2f} s'.format(
+        write_time / n * 1e6, slice_time * 1e3, full_time))
+
+
+def bench_sqlite(path):
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('CREATE TABLE log (id INTEGER PRIMARY KEY, timestamp TEXT, heading REAL, roll REAL, pitch REAL)')
+    db.execute('CREATE INDEX log_timestamp ON log (timestamp)')
+    rows = [('2018-12-19 05:12:{:09.6f}'.format(i / RATE % 60), i % 360, 0.5, -0.5) for i in range(SQLITE_ROWS)]
+    start = time.perf_counter()
+    with db:
+        db.executemany('INSERT INTO log (timestamp, heading, roll, pitch) VALUES (?, ?, ?, ?)', rows)
+    write_time = time.perf_counter() - start
+    db.close()
+    size = os.path.getsize(path)
+    print('sqlite:  {:,} rows, {:.1f} MB on disk ({:.0f} bytes/row), bulk insert {:.1f} us/row'.format(
+        SQLITE_ROWS, size / 1e6, size / SQLITE_ROWS, write_time / SQLITE_ROWS * 1e6))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        bench_archive(root)
+        bench_sqlite(os.path.join(root, 'log.sqlite3'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Accuracy and speed of the local tangent plane geodesy against pygc
+
+    python benchmarks/bench_geodesy.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pygc import great_distance  # noqa: E402
+
+from auv_control_pi.geodesy import LocalFrame, bearing_distance  # noqa: E402
+from auv_control_pi.utils import Point, point_at_distance  # noqa: E402
+
+ORIGIN = Point(49.273008, -123.179694)
+N_SAMPLES = 500
+
+
+def pygc_bearing_distance(point_a, point_b):
+    # what the navigator did per tick: heading_to_point + distance_to_point
+    heading = great_distance(start_latitude=point_a.lat, start_longitude=point_a.lng,
+                             end_latitude=point_b.lat, end_longitude=point_b.lng)['azimuth']
+    distance = great_distance(start_latitude=point_a.lat, start_longitude=point_a.lng,
+                              end_latitude=point_b.lat, end_longitude=point_b.lng)['distance']
+    return float(heading), float(distance)
+
+
+def accuracy(frame, mission_range):
+    rng = random.Random(0)
+    max_distance_error = 0
+    max_bearing_error = 0
+    for _ in range(N_SAMPLES):
+        start = point_at_distance(rng.uniform(0, mission_range), rng.uniform(0, 360), ORIGIN)
+        end = point_at_distance(rng.uniform(10, mission_range), rng.uniform(0, 360), start)
+        bearing, distance = frame.bearing_distance(start, end)
+        expected_bearing, expected_distance = pygc_bearing_distance(start, end)
+        max_distance_error = max(max_distance_error, abs(distance - expected_distance) / expected_distance)
+        max_bearing_error = max(max_bearing_error, abs((bearing - expected_bearing + 180) % 360 - 180))
+    return max_distance_error, max_bearing_error
+
+
+def main():
+    frame = LocalFrame(ORIGIN)
+    print('range     distance error   bearing error')
+    for mission_range in (100, 1000, 5000, 10000, 50000):
+        distance_error, bearing_error = accuracy(frame, mission_range)
+        print('{:>6} m  {:>12.4f} %  {:>10.4f} deg'.format(mission_range, distance_error * 100, bearing_error))
+
+    current = point_at_distance(800, 30, ORIGIN)
+    target = point_at_distance(2000, 45, ORIGIN)
+    target_enu = frame.to_enu(target)
+    n = 20000
+    pygc_time = timeit.timeit(lambda: pygc_bearing_distance(current, target), number=n // 10) / (n // 10)
+    frame_time = timeit.timeit(lambda: bearing_distance(frame.to_enu(current), target_enu), number=n) / n
+    print('pygc heading + distance: {:.1f} us/tick'.format(pygc_time * 1e6))
+    print('local frame:             {:.1f} us/tick ({:.0f}x)'.format(frame_time * 1e6, pygc_time / frame_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare point in geofence tests using the precomputed polygon grid index
+against ray casting over every edge, for coastline-like polygons with
+thousands of vertices:
+
+    python benchmarks/bench_geofence.py
+"""
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auv_control_pi.geofence import Fence  # noqa: E402
+from auv_control_pi.spatial import PolygonGridIndex, point_in_polygon  # noqa: E402
+from auv_control_pi.utils import Point, point_at_distance  # noqa: E402
+
+ORIGIN = Point(49.273008, -123.179694)
+RADIUS = 5000  # meters
+N_CHECKS = 2000
+
+
+def coastline(n_vertices, rng):
+    """A ragged closed shoreline around ORIGIN, as (lat, lng) pairs"""
+    # a few octaves of noise on the radius gives bays and headlands at several scales
+    phases = [rng.uniform(0, 2 * math.pi) for _ in range(6)]
+    vertices = []
+    for i in range(n_vertices):
+        angle = 2 * math.pi * i / n_vertices
+        r = 1 + sum(0.5 ** octave * 0.25 * math.sin((3 ** octave) * angle + phase)
+                    for octave, phase in enumerate(phases))
+        r += rng.uniform(-0.01, 0.01)
+        point = point_at_distance(RADIUS * r, math.degrees(angle), ORIGIN)
+        vertices.append((point.lat, point.lng))
+    return vertices
+
+
+def main():
+    rng = random.Random(0)
+    print('{:>9} {:>10} {:>14} {:>16} {:>9}'.format(
+        'vertices', 'build ms', 'grid us/check', 'ray cast us/check', 'speedup'))
+    for n_vertices in (1000, 5000, 20000):
+        vertices = coastline(n_vertices, rng)
+
+        start = time.perf_counter()
+        fence = Fence(vertices)
+        build = time.perf_counter() - start
+
+        positions = [fence.frame.to_enu(point_at_distance(rng.uniform(0, 1.6 * RADIUS), rng.uniform(0, 360), ORIGIN))
+                     for _ in range(N_CHECKS)]
+        enu_vertices = [fence.frame.to_enu(Point(lat, lng)) for lat, lng in vertices]
+        index = fence.index
+        assert isinstance(index, PolygonGridIndex)
+
+        start = time.perf_counter()
+        grid_results = [index.contains(position) for position in positions]
+        grid = (time.perf_counter() - start) / N_CHECKS
+
+        start = time.perf_counter()
+        brute_results = [point_in_polygon(position, enu_vertices) for position in positions]
+        brute = (time.perf_counter() - start) / N_CHECKS
+
+        assert grid_results == brute_results
+        print('{:>9} {:>10.0f} {:>14.1f} {:>16.1f} {:>8.0f}x'.format(
+            n_vertices, build * 1e3, grid * 1e6, brute * 1e6, brute / grid))
+
+
+if __name__ == '__main__':
+    main()
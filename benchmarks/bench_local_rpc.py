@@ -0,0 +1,96 @@
+"""
+Compare steering a co-located AUV mixer directly with a JSON RPC round
+trip over a loopback websocket-like connection.
+
+The router is stood in for by an asyncio TCP server in the same process
+that decodes the call, runs the mixer and sends the result back, so the
+remote figure is a lower bound: the real path also crosses the crossbar
+router twice each way.
+
+    python benchmarks/bench_local_rpc.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+N_CALLS = 2000
+
+
+def get_motor_speed(throttle, turn_speed):
+    # copy of auv_control.get_motor_speed, the component module needs autobahn
+    turn_speed = abs(turn_speed)
+    motor_speed = 100 - turn_speed * 2
+    return round(throttle * motor_speed / 100)
+
+
+class Mixer:
+
+    def __init__(self):
+        self.throttle = 50
+        self.left = self.right = 0
+
+    def set_turn_val(self, turn_speed):
+        turn_speed = int(turn_speed)
+        if turn_speed < 0:
+            self.right, self.left = self.throttle, get_motor_speed(self.throttle, turn_speed)
+        else:
+            self.right, self.left = get_motor_speed(self.throttle, turn_speed), self.throttle
+
+
+async def direct(mixer):
+    rpcs = {'auv.set_turn_val': mixer.set_turn_val}
+    samples = []
+    for i in range(N_CALLS):
+        start = time.perf_counter()
+        future = asyncio.Future()
+        future.set_result(rpcs['auv.set_turn_val'](i % 40 - 20))
+        await future
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def remote(mixer):
+    async def handle(reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            call = json.loads(line.decode())
+            result = mixer.set_turn_val(*call['args'])
+            writer.write(json.dumps({'id': call['id'], 'result': result}).encode() + b'\n')
+            await writer.drain()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    samples = []
+    for i in range(N_CALLS):
+        start = time.perf_counter()
+        writer.write(json.dumps({'id': i, 'procedure': 'auv.set_turn_val', 'args': [i % 40 - 20]}).encode() + b'\n')
+        await writer.drain()
+        json.loads((await reader.readline()).decode())
+        samples.append(time.perf_counter() - start)
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return samples
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return '{:8.1f} us median {:8.1f} us p99'.format(
+        samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6)
+
+
+def main():
+    loop = asyncio.get_event_loop()
+    print('direct call:        ', summary(loop.run_until_complete(direct(Mixer()))))
+    print('loopback JSON RPC:  ', summary(loop.run_until_complete(remote(Mixer()))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Compare SPI transactions needed to frame one navigation epoch of UBX
+messages with per-field reads versus buffered chunk reads.
+
+The receiver is replaced by a fake spidev device which clocks out the
+epoch followed by 0xFF idle filler, so this runs without hardware:
+
+    python benchmarks/bench_ublox_spi.py
+"""
+import os
+import struct
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from navio import ublox  # noqa: E402
+
+SPI_HZ = 5000000
+CHUNK_SIZE = 256
+
+
+class FakeSpiDev:
+
+    def __init__(self):
+        self.stream = bytearray()
+        self.max_speed_hz = None
+
+    def open(self, bus, cs):
+        pass
+
+    def readbytes(self, n):
+        out = self.stream[:n]
+        del self.stream[:n]
+        return list(out) + [0xff] * (n - len(out))
+
+
+def frame(msg_class, msg_id, payload):
+    msg = ublox.UBloxMessage()
+    buf = struct.pack('<BBBBH', ublox.PREAMBLE1, ublox.PREAMBLE2, msg_class, msg_id, len(payload)) + payload
+    return buf + struct.pack('<BB', *msg.checksum(data=buf[2:]))
+
+
+def epoch():
+    """The messages navio.gps.GPS enables, for 32 channels / 16 satellites"""
+    return b''.join([
+        frame(ublox.CLASS_NAV, ublox.MSG_NAV_PVT, bytes(92)),
+        frame(ublox.CLASS_NAV, ublox.MSG_NAV_SVINFO, bytes(8 + 12 * 32)),
+        frame(ublox.CLASS_NAV, ublox.MSG_NAV_VELECEF, bytes(20)),
+        frame(ublox.CLASS_NAV, ublox.MSG_NAV_POSECEF, bytes(20)),
+        frame(ublox.CLASS_RXM, ublox.MSG_RXM_RAW, bytes(8 + 24 * 16)),
+        frame(ublox.CLASS_RXM, ublox.MSG_RXM_SVSI, bytes(8 + 6 * 32)),
+    ] + [frame(ublox.CLASS_RXM, ublox.MSG_RXM_SFRB, bytes(42))] * 8)
+
+
+def run(chunk_size, n_epochs=200):
+    spidev = types.ModuleType('spidev')
+    spidev.SpiDev = FakeSpiDev
+    sys.modules['spidev'] = spidev
+    ubl = ublox.UBlox('spi:0.0', baudrate=SPI_HZ, spi_chunk_size=chunk_size)
+
+    data = epoch()
+    n_messages = 14
+    start = time.perf_counter()
+    for _ in range(n_epochs):
+        ubl.dev.stream.extend(data)
+        transactions = ubl.spi_transactions
+        for _ in range(n_messages):
+            msg = ubl.receive_message()
+            assert msg is not None and msg.valid()
+        transactions = ubl.spi_transactions - transactions
+    elapsed = time.perf_counter() - start
+    return transactions, elapsed / n_epochs, len(data)
+
+
+def main():
+    per_field, per_field_time, epoch_bytes = run(None)
+    chunked, chunked_time, _ = run(CHUNK_SIZE)
+    wire_time_us = CHUNK_SIZE * 8 / SPI_HZ * 1e6
+    print('epoch size: {} bytes in 14 messages'.format(epoch_bytes))
+    print('per-field reads: {} transactions/epoch, {:.0f} us cpu/epoch'.format(per_field, per_field_time * 1e6))
+    print('{}-byte chunks:  {} transactions/epoch, {:.0f} us cpu/epoch ({:.0f} us on the wire per chunk at {} MHz)'.format(
+        CHUNK_SIZE, chunked, chunked_time * 1e6, wire_time_us, SPI_HZ / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,36 @@
+import logging
+from threading import Thread, Event
+
 from . import ublox
+from .ublox_log import UBloxRecorder, UBloxReplay
+
+logger = logging.getLogger(__name__)
+
+# size of each SPI transfer, large enough to hold several messages per transaction
+SPI_CHUNK_SIZE = 256
+
+
+def satellite_summary(svinfo):
+    """Compact satellite status from a NAV_SVINFO message unpacked with `columnar=True`
+    """
+    cno = svinfo.columns.get('cno', ())
+    flags = svinfo.columns.get('flags', ())
+    # bit 0 of flags is set when the satellite is used for navigation
+    used_cno = [c for c, f in zip(cno, flags) if f & 0x01]
+    return {
+        'channels': len(cno),
+        'tracked': sum(1 for c in cno if c > 0),
+        'used': len(used_cno),
+        'cno_mean': sum(used_cno) / len(used_cno) if used_cno else None,
+        'cno_max': max(cno) if cno else None,
+    }
 
 
 class GPS:
 
-    def __init__(self):
+    def __init__(self, logfile=None):
 
-        self.ubl = ublox.UBlox("spi:0.0", baudrate=5000000, timeout=2)
+        self.ubl = ublox.UBlox("spi:0.0", baudrate=5000000, timeout=2, spi_chunk_size=SPI_CHUNK_SIZE)
 
         self.ubl.configure_poll_port()
         self.ubl.configure_poll(ublox.CLASS_CFG, ublox.MSG_CFG_USB)
@@ -23,11 +48,13 @@ class GPS:
         self.ubl.set_preferred_dynamic_model(None)
         self.ubl.set_preferred_usePPP(None)
 
-        self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_POSLLH, 1)
+        # NAV_PVT carries position, velocity, fix status and time in a single
+        # frame so the separate POSLLH/STATUS/SOL/VELNED messages are disabled
         self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_PVT, 1)
-        self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_STATUS, 1)
-        self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_SOL, 1)
-        self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_VELNED, 1)
+        self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_POSLLH, 0)
+        self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_STATUS, 0)
+        self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_SOL, 0)
+        self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_VELNED, 0)
         self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_SVINFO, 1)
         self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_VELECEF, 1)
         self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_POSECEF, 1)
@@ -40,16 +67,69 @@ class GPS:
         self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_CLOCK, 5)
         # self.ubl.configure_message_rate(ublox.CLASS_NAV, ublox.MSG_NAV_DGPS, 5)
 
+        if logfile is not None:
+            self.ubl.set_recorder(UBloxRecorder(logfile))
+
         self.msg = None
 
-    def update(self):
-        self.msg = self.ubl.receive_message()
+    def update(self, timeout=None):
+        self.msg = self.ubl.receive_message(timeout=timeout)
+        return self.msg
+
 
-        if self.msg.name() == "NAV_POSLLH":
-            outstr = str(self.msg).split(",")[1:]
-            outstr = "".join(outstr)
+class ReplayGPS(GPS):
+    """Replay a log recorded by `GPS(logfile=...)` instead of reading the receiver"""
 
-        if self.msg.name() == "NAV_STATUS":
-            outstr = str(self.msg).split(",")[1:2]
-            outstr = "".join(outstr)
-        return self.msg
+    def __init__(self, logfile, speed=1):
+        self.ubl = UBloxReplay(logfile, speed=speed)
+        self.msg = None
+
+
+class GPSReader(Thread):
+    """Read messages from the GPS in a background thread
+
+    Messages are handed over to an `asyncio.Queue` on the given event loop so
+    the blocking serial/SPI reads never run inside a coroutine. When the queue
+    is full the oldest message is dropped since only fresh fixes are useful.
+    """
+
+    def __init__(self, gps, loop, queue, poll_timeout=1):
+        super().__init__(daemon=True)
+        self.gps = gps
+        self.loop = loop
+        self.queue = queue
+        # upper bound on how long a single read may block so `stop()` is honoured promptly
+        self.poll_timeout = poll_timeout
+        self.dropped = 0
+        self._stop_event = Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                msg = self.gps.update(timeout=self.poll_timeout)
+            except (ublox.UBloxError, OSError) as e:
+                logger.warning('GPS read failed: {}'.format(e))
+                self._stop_event.wait(0.1)
+                continue
+            if msg is not None:
+                try:
+                    self.loop.call_soon_threadsafe(self._put, msg)
+                except RuntimeError:
+                    # the event loop has been closed
+                    break
+
+    def _put(self, msg):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(msg)
+
+    def stop(self, timeout=0.1):
+        """Ask the thread to stop, waiting at most `timeout` seconds for it
+
+        This is called from the event loop, so it doesn't wait out a read
+        that is blocked on the receiver. The thread is a daemon and exits
+        once that read returns.
+        """
+        self._stop_event.set()
+        self.join(timeout)
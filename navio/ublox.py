@@ -164,6 +164,9 @@ RESET_HW_GRACEFUL = 4
 RESET_GPS_STOP = 8
 RESET_GPS_START = 9
 
+# time to wait before polling the SPI bus again when the receiver has no data
+SPI_IDLE_SLEEP = 0.005
+
 
 class UBloxError(Exception):
     '''Ublox error class'''
@@ -218,8 +221,13 @@ class UBloxDescriptor:
         f = list(struct.unpack(fmt, buf[:size]))
         return f
 
-    def unpack(self, msg):
-        '''unpack a UBloxMessage, creating the .fields and ._recs attributes in msg'''
+    def unpack(self, msg, columnar=False):
+        '''unpack a UBloxMessage, creating the .fields and ._recs attributes in msg
+
+        With columnar set the repeated block is decoded in one pass into
+        ._columns, a dict mapping each field to a tuple of values, instead
+        of building a UBloxAttrDict per record.
+        '''
         msg._fields = {}
 
         # unpack main message blocks. A comm
@@ -227,6 +235,7 @@ class UBloxDescriptor:
         buf = msg._buf[6:-2]
         count = 0
         msg._recs = []
+        msg._columns = {}
         fields = self.fields[:]
 
         for fmt in formats:
@@ -254,7 +263,7 @@ class UBloxDescriptor:
                 break
 
         if self.count_field == '_remaining':
-            count = len(buf) / struct.calcsize(self.format2)
+            count = len(buf) // struct.calcsize(self.format2)
 
         if count == 0:
             msg._unpacked = True
@@ -263,6 +272,14 @@ class UBloxDescriptor:
             return
 
         size2 = struct.calcsize(self.format2)
+        if columnar:
+            if size2 * count != len(buf):
+                raise UBloxError("INVALID_SIZE=%u, " % len(buf))
+            rows = struct.iter_unpack(self.format2, buf)
+            msg._columns = dict(zip(self.fields2, zip(*rows)))
+            msg._unpacked = True
+            return
+
         for c in range(count):
             r = UBloxAttrDict()
             if size2 > len(buf):
@@ -538,6 +555,7 @@ class UBloxMessage:
         self._buf = b""
         self._fields = {}
         self._recs = []
+        self._columns = {}
         self._unpacked = False
         self.debug_level = 0
 
@@ -557,6 +575,8 @@ class UBloxMessage:
         except KeyError:
             if name == 'recs':
                 return self._recs
+            if name == 'columns':
+                return self._columns
             raise AttributeError(name)
 
     def __setattr__(self, name, value):
@@ -575,14 +595,14 @@ class UBloxMessage:
         if self.debug_level >= level:
             print(msg)
 
-    def unpack(self):
+    def unpack(self, columnar=False):
         '''unpack a message'''
         if not self.valid():
             raise UBloxError('INVALID MESSAGE')
         type = self.msg_type()
         if not type in msg_types:
             raise UBloxError('Unknown message %s length=%u' % (str(type), len(self._buf)))
-        msg_types[type].unpack(self)
+        msg_types[type].unpack(self, columnar=columnar)
 
     def pack(self):
         '''pack a message'''
@@ -701,7 +721,7 @@ class UBlox:
     port can be a file (for reading only) or a serial device
     '''
 
-    def __init__(self, port, baudrate=115200, timeout=0):
+    def __init__(self, port, baudrate=115200, timeout=0, spi_chunk_size=None):
 
         self.serial_device = port
         self.baudrate = baudrate
@@ -710,6 +730,12 @@ class UBlox:
         self.use_xfer = False
         self.debug_level = 0
 
+        # when set, SPI reads are done in fixed size transfers which are buffered
+        # and handed out to the framer, rather than one small transfer per field
+        self.spi_chunk_size = spi_chunk_size
+        self.spi_transactions = 0
+        self._spi_buf = bytearray()
+
         if self.serial_device.startswith("tcp:"):
             import socket
             a = self.serial_device.split(':')
@@ -737,12 +763,14 @@ class UBlox:
                                      dsrdtr=False, rtscts=False, xonxoff=False, timeout=timeout)
         self.logfile = None
         self.log = None
+        self.recorder = None
         self.preferred_dynamic_model = None
         self.preferred_usePPP = None
         self.preferred_dgps_timeout = None
 
     def close(self):
         '''close the device'''
+        self.set_recorder(None)
         self.dev.close()
         self.dev = None
 
@@ -768,6 +796,12 @@ class UBlox:
                 mode = 'wb'
             self.log = open(self.logfile, mode=mode)
 
+    def set_recorder(self, recorder):
+        '''record every received message with a ublox_log.UBloxRecorder, or None to stop'''
+        if self.recorder is not None:
+            self.recorder.close()
+        self.recorder = recorder
+
     def set_preferred_dynamic_model(self, model):
         '''set the preferred dynamic model for receiver'''
         self.preferred_dynamic_model = model
@@ -822,12 +856,45 @@ class UBlox:
             except socket.error as e:
                 return b''
         if self.use_xfer:
+            if self.spi_chunk_size:
+                return self.read_spi_chunked(n)
+            self.spi_transactions += 1
             buf = self.dev.readbytes(n)
             return buf
 
         buf = self.dev.read(n)
         return buf
 
+    def read_spi_chunked(self, n, skip_filler=False):
+        '''read up to n bytes from the SPI receive buffer, refilling it in spi_chunk_size transfers
+
+        With skip_filler set everything up to the next message preamble is
+        discarded, which drops the 0xFF idle filler the receiver clocks out
+        when it has nothing to send. An empty result means there is no
+        message start on the bus yet.
+        '''
+        buf = self._spi_buf
+        if skip_filler:
+            start = buf.find(PREAMBLE1)
+            if start == -1:
+                # poll an idle receiver with a header sized transfer so we don't
+                # hold the shared bus for a full chunk of filler
+                del buf[:]
+                buf.extend(self.dev.readbytes(8))
+                self.spi_transactions += 1
+                start = buf.find(PREAMBLE1)
+                if start == -1:
+                    del buf[:]
+                    return b''
+            del buf[:start]
+
+        while len(buf) < n:
+            buf.extend(self.dev.readbytes(self.spi_chunk_size))
+            self.spi_transactions += 1
+        b = bytes(buf[:n])
+        del buf[:n]
+        return b
+
     def send_nmea(self, msg):
         if not self.read_only:
             s = msg + "*%02X" % self.nmea_checksum(msg)
@@ -888,33 +955,50 @@ class UBlox:
 
     def receive_message_nonblocking(self, seconds=5):
         '''nonblocking receive of one ublox message'''
-        with Timeout(seconds=seconds):
-            return self.receive_message()
+        return self.receive_message(timeout=seconds)
+
+    def receive_message(self, ignore_eof=False, timeout=None):
+        '''blocking receive of one ublox message
 
-    def receive_message(self, ignore_eof=False):
-        '''blocking receive of one ublox message'''
+        If timeout (in seconds) is given, None is returned when no complete
+        message has arrived before the deadline. This is safe to use from any
+        thread, unlike a signal based alarm.
+        '''
         msg = UBloxMessage()
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
         while True:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
             n = msg.needed_bytes()
-            b = self.read(n)
-            if not b:
-                if ignore_eof:
-                    time.sleep(0.01)
+            if self.use_xfer and self.spi_chunk_size:
+                b = self.read_spi_chunked(n, skip_filler=len(msg._buf) == 0)
+                if not b:
+                    time.sleep(SPI_IDLE_SLEEP)
                     continue
-                return None
-            if self.use_xfer:
-                if PYTHON_VERSION == 3:
-                    bb = bytearray()
-                    for c in b:
-                        bb.append(c)
-                    b = bb
-                else:
-                    b = "".join([chr(c) for c in b])  # here str
+            else:
+                b = self.read(n)
+                if not b:
+                    if ignore_eof:
+                        time.sleep(0.01)
+                        continue
+                    return None
+                if self.use_xfer:
+                    if PYTHON_VERSION == 3:
+                        b = bytearray(b)
+                    else:
+                        b = "".join([chr(c) for c in b])  # here str
             msg.add(b)
             if self.log is not None:
                 self.log.write(b)
                 self.log.flush()
+            if self.use_xfer and len(msg._buf) == 0:
+                # the receiver only sent idle filler, back off instead of spinning on the bus
+                time.sleep(SPI_IDLE_SLEEP)
             if msg.valid():
+                if self.recorder is not None:
+                    self.recorder.write(msg)
                 self.special_handling(msg)
                 return msg
 
@@ -993,26 +1077,3 @@ class UBlox:
         ''' Reset the module for hot/warm/cold start'''
         payload = struct.pack('<HBB', set, mode, 0)
         self.send_message(CLASS_CFG, MSG_CFG_RST, payload)
-
-
-class TimeoutError(Exception):
-    pass
-
-
-import signal
-
-
-class Timeout:
-    def __init__(self, seconds=1, msg='Timeout'):
-        self.seconds = seconds
-        self.msg = msg
-
-    def handle_timeout(self, signum, frame):
-        raise TimeoutError(self.msg)
-
-    def __enter__(self):
-        signal.signal(signal.SIGALRM, self.handle_timeout)
-        signal.alarm(self.seconds)
-
-    def __exit__(self, type, value, traceback):
-        signal.alarm(0)
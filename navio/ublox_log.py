@@ -0,0 +1,188 @@
+'''
+Indexed recording and replay of UBlox message logs
+
+The recorder writes complete UBX frames to a log file together with a
+sidecar index (log file name + '.idx') holding one fixed size record per
+frame: (monotonic receive time, iTOW, byte offset). The index lets the
+replayer seek by time or iTOW without re-parsing the log from the start,
+and the log itself is memory-mapped so multi-hour traces are cheap to open.
+'''
+import mmap
+import struct
+import time
+from array import array
+from bisect import bisect_left
+
+from . import ublox
+
+# monotonic time [s], iTOW [ms], byte offset of the frame in the log
+INDEX_RECORD = struct.Struct('<dIQ')
+
+
+def index_path(logfile):
+    return logfile + '.idx'
+
+
+class UBloxRecorder:
+    '''Buffered writer of UBX frames and their index
+
+    Both files are flushed every flush_interval seconds. Index records are
+    held back until the frames they point at have been flushed, so the index
+    on disk never references bytes missing from the log.
+    '''
+
+    def __init__(self, logfile, buffer_size=64 * 1024, flush_interval=1, clock=time.monotonic):
+        self.logfile = logfile
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.log = open(logfile, mode='wb', buffering=buffer_size)
+        self.index = open(index_path(logfile), mode='wb')
+        self.offset = 0
+        # iTOW of the most recent navigation message, frames without one inherit it
+        self.itow = 0
+        self._records = bytearray()
+        self._flushed_at = clock()
+
+    def write(self, msg):
+        '''append a valid UBloxMessage to the log'''
+        buf = bytes(msg._buf)
+        if msg.msg_class() == ublox.CLASS_NAV and msg.msg_length() >= 4:
+            (self.itow,) = struct.unpack_from('<I', buf, 6)
+        now = self.clock()
+        self._records += INDEX_RECORD.pack(now, self.itow, self.offset)
+        self.log.write(buf)
+        self.offset += len(buf)
+        if now - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.log.flush()
+        self.index.write(self._records)
+        self.index.flush()
+        self._records = bytearray()
+        self._flushed_at = self.clock()
+
+    def close(self):
+        self.flush()
+        self.log.close()
+        self.index.close()
+
+
+class UBloxReplay:
+    '''Replay a recorded log through the same receive API as UBlox
+
+    speed sets the replay rate relative to real time (2 replays twice as
+    fast), use None to return messages as fast as they are asked for.
+    '''
+
+    def __init__(self, logfile, speed=1, clock=time.monotonic, sleep=time.sleep):
+        self.logfile = logfile
+        self.speed = speed
+        self.clock = clock
+        self.sleep = sleep
+
+        self.times = array('d')
+        self.itows = array('I')
+        self.offsets = array('Q')
+        with open(index_path(logfile), mode='rb') as f:
+            for t, itow, offset in INDEX_RECORD.iter_unpack(f.read()):
+                self.times.append(t)
+                self.itows.append(itow)
+                self.offsets.append(offset)
+
+        self._file = open(logfile, mode='rb')
+        self._size = 0
+        self._mm = None
+        if self.offsets:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._size = len(self._mm)
+        self._pos = 0
+        self._anchor = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def duration(self):
+        '''length of the recording in seconds'''
+        if not self.times:
+            return 0
+        return self.times[-1] - self.times[0]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def _seek(self, pos):
+        self._pos = max(0, min(pos, len(self)))
+        # restart the replay clock from the new position
+        self._anchor = None
+
+    def seek_time(self, seconds):
+        '''seek to the first message received at least `seconds` after the start of the log'''
+        if self.times:
+            self._seek(bisect_left(self.times, self.times[0] + seconds))
+
+    def seek_itow(self, itow):
+        '''seek to the first message of the navigation epoch at or after the given iTOW
+
+        This assumes the log doesn't span a GPS week rollover.
+        '''
+        self._seek(bisect_left(self.itows, itow))
+
+    def seek_percent(self, pct):
+        '''seek to the given percentage of the recording duration'''
+        self.seek_time(pct * 0.01 * self.duration)
+
+    def tell(self):
+        '''seconds from the start of the log of the next message'''
+        if self._pos >= len(self):
+            return self.duration
+        return self.times[self._pos] - self.times[0]
+
+    def _wait(self, timeout):
+        '''wait until the next message is due, return False if that is beyond the timeout'''
+        if not self.speed:
+            return True
+        now = self.clock()
+        if self._anchor is None:
+            self._anchor = (now, self.times[self._pos])
+        wall_start, log_start = self._anchor
+        due = wall_start + (self.times[self._pos] - log_start) / self.speed
+        delay = due - now
+        if timeout is not None and delay > timeout:
+            self.sleep(timeout)
+            return False
+        if delay > 0:
+            self.sleep(delay)
+        return True
+
+    def receive_message(self, ignore_eof=False, timeout=None):
+        '''receive the next message, paced to the recorded timing'''
+        if self._pos >= len(self):
+            if timeout is not None:
+                self.sleep(timeout)
+            return None
+        if not self._wait(timeout):
+            return None
+        start = self.offsets[self._pos]
+        # the frame length comes from its header rather than the next offset,
+        # a log cut short while recording has unindexed bytes after the last frame
+        (length,) = struct.unpack_from('<H', self._mm, start + 4)
+        end = min(start + 8 + length, self._size)
+        self._pos += 1
+        msg = ublox.UBloxMessage()
+        msg.add(self._mm[start:end])
+        return msg
+
+    def receive_message_nonblocking(self, seconds=5):
+        return self.receive_message(timeout=seconds)
+
+    def receive_message_noerror(self, ignore_eof=False):
+        try:
+            return self.receive_message(ignore_eof=ignore_eof)
+        except ublox.UBloxError as e:
+            print(e)
+            return None